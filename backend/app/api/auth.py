@@ -1,41 +1,54 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body, BackgroundTasks, Query
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from datetime import timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
 from jose import jwt, JWTError
 from pydantic import EmailStr
+from typing import Optional
 
-from app.db.base import get_db
-from app.schemas.user import UserCreate, Token, User, SocialLogin
-from app.services.user import create_user, authenticate_user, get_user, verify_user_email, get_user_by_email, create_social_user
+from app.db.base import get_async_db
+from app.schemas.user import UserCreate, Token, User, SocialLogin, BirthInfo, DigestPreference
+from app.services.user import Principal, principal_cache, create_user, authenticate_user, get_user, verify_user_email, get_user_by_email, create_social_user, update_birth_info, update_daily_digest_opt_in
 from app.core.security import create_access_token
 from app.core.config import settings
 from app.utils.email import send_verification_email, generate_email_verification_token, verify_email_token
-from app.models.user import AuthProvider
+from app.models.user import AuthProvider, SubscriptionTier
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-async def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+async def get_user_from_token(db: AsyncSession, token: str) -> Optional[Principal]:
+    """The user an access token was issued to, or None if it is invalid or expired.
+
+    Principals are cached per token, so most requests skip both the JWT
+    check and the user lookup.
+    """
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        user_id: int = int(payload.get("sub"))
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = get_user(db, user_id=user_id)
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        return None
+    user = await get_user(db, user_id=user_id)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    principal_cache.set(token, principal, expires_at=payload.get("exp"))
+    return principal
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> Principal:
+    user = await get_user_from_token(db, token)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
 def get_current_verified_user(current_user: User = Depends(get_current_user)) -> User:
@@ -46,13 +59,35 @@ def get_current_verified_user(current_user: User = Depends(get_current_user)) ->
         )
     return current_user
 
+TIER_RANK = {
+    SubscriptionTier.FREE: 0,
+    SubscriptionTier.BASIC: 1,
+    SubscriptionTier.PREMIUM: 2,
+    SubscriptionTier.PROFESSIONAL: 3,
+}
+
+def require_tier(tier: SubscriptionTier):
+    """Dependency factory: the current user needs an active plan of at least ``tier``."""
+    def dependency(current_user: User = Depends(get_current_verified_user)) -> User:
+        expired = (
+            current_user.subscription_expiry is not None
+            and current_user.subscription_expiry < datetime.utcnow()
+        )
+        if TIER_RANK[current_user.subscription_tier] < TIER_RANK[tier] or expired:
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail=f"This feature requires the {tier.value} plan or higher.",
+            )
+        return current_user
+    return dependency
+
 @router.post("/register", response_model=User)
 async def register(
     background_tasks: BackgroundTasks,
     user_in: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = create_user(db, user_in)
+    user = await create_user(db, user_in)
     
     # Generate verification token
     token = generate_email_verification_token(user.email)
@@ -65,9 +100,9 @@ async def register(
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -85,7 +120,7 @@ async def login(
 @router.post("/social-login", response_model=Token)
 async def social_login(
     login_data: SocialLogin,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     # This would normally validate with the provider and get user details
     # For now we'll mock it with dummy data based on the provider
@@ -112,7 +147,7 @@ async def social_login(
         )
     
     # Create or update user
-    user = create_social_user(
+    user = await create_social_user(
         db, 
         email=email,
         username=username,
@@ -129,7 +164,7 @@ async def social_login(
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/verify-email")
-async def verify_email(token: str = Query(...), db: Session = Depends(get_db)):
+async def verify_email(token: str = Query(...), db: AsyncSession = Depends(get_async_db)):
     email = verify_email_token(token)
     if not email:
         raise HTTPException(
@@ -137,7 +172,7 @@ async def verify_email(token: str = Query(...), db: Session = Depends(get_db)):
             detail="Invalid token",
         )
     
-    user = get_user_by_email(db, email=email)
+    user = await get_user_by_email(db, email=email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -147,10 +182,37 @@ async def verify_email(token: str = Query(...), db: Session = Depends(get_db)):
     if user.is_verified:
         return {"message": "Email already verified"}
     
-    verify_user_email(db, user_id=user.id)
+    await verify_user_email(db, user_id=user.id)
     return {"message": "Email verified successfully"}
 
 @router.get("/me", response_model=User)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
     """Get current user information"""
-    return current_user
\ No newline at end of file
+    user = await get_user(db, user_id=current_user.id)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found",
+        )
+    return user
+
+@router.put("/me/birth-info", response_model=User)
+async def update_my_birth_info(
+    birth_info: BirthInfo,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Set birth details used for the natal chart (birth time in UTC)"""
+    return await update_birth_info(db, user_id=current_user.id, birth_info=birth_info)
+
+@router.put("/me/daily-digest", response_model=User)
+async def update_my_daily_digest(
+    preference: DigestPreference,
+    current_user: User = Depends(get_current_verified_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Opt in to (or out of) the daily reading email"""
+    return await update_daily_digest_opt_in(db, user_id=current_user.id, opt_in=preference.daily_digest_opt_in)
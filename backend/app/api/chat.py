@@ -1,88 +1,388 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Request, Query, WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import AsyncIterator, List, Optional, Set
+from jose import jwt
+import asyncio
+import json
+import time
 
-from app.db.base import get_db
-from app.schemas.user import Chat, User, MessageCreate, Message
-from app.services.chat import get_user_chats, get_chat, create_chat, add_message, update_chat_title, delete_chat
-from app.api.auth import get_current_verified_user
-from app.services.astro import get_astro_response
+from app.db.base import get_async_db, AsyncSessionLocal
+from app.models import user as models
+from app.core.config import settings
+from app.schemas.user import Chat, ChatBulkDelete, ChatMeta, ChatSummary, User, MessageCreate, Message, MessagePage, SearchPage
+from app.services.chat import get_user_chat_summaries, get_chat, get_chat_with_messages, create_chat, add_message, add_message_pair, update_chat_title, delete_chat, delete_chats, get_chat_messages, get_chat_context
+from app.api.auth import get_current_verified_user, get_user_from_token, require_tier
+from app.services.export import MEDIA_TYPES, ExportFormat, export_chats
+from app.services.search import search_messages
+from app.services.generation import get_response_backend
+from app.services.natal import get_natal_positions
+from app.services.usage import consume_quota, refund_quota
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
-@router.get("/", response_model=List[Chat])
-def read_chats(
+@router.get("/", response_model=List[ChatSummary])
+async def read_chats(
+    skip: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=100),
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all chats for the current user"""
-    return get_user_chats(db, user_id=current_user.id)
+    """Get chat summaries for the current user, most recently active first"""
+    return await get_user_chat_summaries(db, user_id=current_user.id, skip=skip, limit=limit)
 
 @router.post("/", response_model=Chat)
-def create_new_chat(
+async def create_new_chat(
     title: str = Body("New Chat"),
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new chat session"""
-    return create_chat(db, user_id=current_user.id, title=title)
+    return await create_chat(db, user=current_user, title=title)
+
+@router.get("/search", response_model=SearchPage)
+async def search_chats(
+    q: str = Query(..., min_length=1, max_length=200),
+    after: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_verified_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Search the current user's messages, best match first; follow ``next_cursor`` for more"""
+    return await search_messages(db, user_id=current_user.id, q=q, after=after, limit=limit)
+
+@router.get("/export")
+async def export_chat_history(
+    format: ExportFormat = Query(ExportFormat.NDJSON),
+    gzip: bool = Query(False),
+    current_user: User = Depends(require_tier(models.SubscriptionTier.BASIC))
+):
+    """Download all of the user's chats and messages, archived ones included, as NDJSON or CSV.
+
+    The file is streamed as it's read, so it can be arbitrarily large; pass
+    ``gzip=true`` for a gzip-compressed download.
+    """
+    filename = f"chats.{format.value}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        export_chats(current_user.id, format, compress=gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 @router.get("/{chat_id}", response_model=Chat)
-def read_chat(
+async def read_chat(
     chat_id: int,
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific chat with all messages"""
-    return get_chat(db, chat_id=chat_id, user_id=current_user.id)
+    return await get_chat_with_messages(db, chat_id=chat_id, user_id=current_user.id)
+
+@router.get("/{chat_id}/meta", response_model=ChatMeta)
+async def read_chat_meta(
+    chat_id: int,
+    current_user: User = Depends(get_current_verified_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a chat's details without its messages"""
+    return await get_chat(db, chat_id=chat_id, user_id=current_user.id)
+
+@router.get("/{chat_id}/messages", response_model=MessagePage)
+async def read_chat_messages(
+    chat_id: int,
+    before: Optional[str] = Query(None),
+    after: Optional[str] = Query(None),
+    limit: int = Query(settings.MESSAGE_PAGE_SIZE, ge=1, le=settings.MESSAGE_PAGE_MAX),
+    current_user: User = Depends(get_current_verified_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a page of messages; newest first page, then follow the cursors"""
+    return await get_chat_messages(
+        db, chat_id=chat_id, user_id=current_user.id, before=before, after=after, limit=limit
+    )
 
 @router.put("/{chat_id}", response_model=Chat)
-def update_chat(
+async def update_chat(
     chat_id: int,
     title: str = Body(...),
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update chat title"""
-    return update_chat_title(db, chat_id=chat_id, user_id=current_user.id, title=title)
+    return await update_chat_title(db, chat_id=chat_id, user_id=current_user.id, title=title)
 
 @router.delete("/{chat_id}")
-def remove_chat(
+async def remove_chat(
     chat_id: int,
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a chat"""
-    delete_chat(db, chat_id=chat_id, user_id=current_user.id)
+    await delete_chat(db, chat_id=chat_id, user_id=current_user.id)
     return {"message": "Chat deleted successfully"}
 
+@router.post("/bulk-delete")
+async def remove_chats(
+    request: ChatBulkDelete,
+    current_user: User = Depends(get_current_verified_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Delete several chats at once, or all of them with ``{"all": true}``"""
+    if not request.all and not request.chat_ids:
+        raise HTTPException(status_code=400, detail="Pass chat_ids, or all=true to delete every chat")
+    deleted = await delete_chats(db, user_id=current_user.id, chat_ids=None if request.all else request.chat_ids)
+    return {"message": f"Deleted {len(deleted)} chats", "deleted": len(deleted)}
+
 @router.post("/{chat_id}/messages", response_model=List[Message])
 async def create_message(
     chat_id: int,
     message: MessageCreate,
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new message and get AI response"""
-    # Save user message
-    user_message = add_message(
-        db, 
-        chat_id=chat_id, 
-        user_id=current_user.id, 
-        content=message.content,
-        is_user=True
-    )
+    # Checks the chat is the user's (404) before anything is charged or generated
+    context = await get_chat_context(db, chat_id=chat_id, user_id=current_user.id)
+    period = await consume_quota(db, current_user, "messages")
     
-    # Generate AI response
-    ai_response = get_astro_response(message.content, current_user.username)
+    try:
+        # Generate AI response
+        positions = await get_natal_positions(db, current_user.id)
+        ai_response = await get_response_backend().generate(message.content, current_user.username, positions, context)
+        
+        # Save both messages in one transaction
+        user_message, ai_message = await add_message_pair(
+            db,
+            chat_id=chat_id,
+            user_id=current_user.id,
+            user_content=message.content,
+            ai_content=ai_response
+        )
+    except Exception:
+        # Nothing was stored, so the message isn't charged for
+        await db.rollback()
+        await refund_quota(db, current_user, "messages", period)
+        raise
     
-    # Save AI response
-    ai_message = add_message(
+    return [user_message, ai_message]
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+def _message_payload(message: models.Message) -> dict:
+    return {
+        "id": message.id,
+        "chat_id": message.chat_id,
+        "content": message.content,
+        "is_user": message.is_user,
+        "created_at": message.created_at,
+    }
+
+# Reply cleanups still running after their caller was cancelled
+_finishing: Set["asyncio.Future[Optional[models.Message]]"] = set()
+
+async def _finish_reply(
+    chunks: AsyncIterator[str], chat_id: int, user, generated: List[str], failed: bool, period: Optional[date]
+) -> Optional[models.Message]:
+    """Close a reply's generator and save whatever it produced, even if it was cut short.
+
+    If the backend ``failed`` before producing anything, the message charged
+    to ``period`` for the reply is refunded. The work runs in its own shielded task: the
+    caller may be cancelled at any point (a streaming response whose client
+    disconnects, a socket's reply loop when the socket closes) and the reply
+    must still be stored. Uses its own session, as the request-scoped one may
+    already be closed.
+    """
+    async def finish() -> Optional[models.Message]:
+        await chunks.aclose()
+        async with AsyncSessionLocal() as db:
+            if generated:
+                return await add_message(db, chat_id=chat_id, user_id=user.id, content="".join(generated), is_user=False)
+            if failed:
+                await refund_quota(db, user, "messages", period)
+            return None
+
+    task = asyncio.ensure_future(finish())
+    _finishing.add(task)
+    task.add_done_callback(_finishing.discard)
+    return await asyncio.shield(task)
+
+@router.post("/{chat_id}/messages/stream")
+async def stream_message(
+    chat_id: int,
+    message: MessageCreate,
+    request: Request,
+    current_user: User = Depends(get_current_verified_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Create a new message and stream the AI response as Server-Sent Events.
+
+    Emits ``message`` with the saved user message, one ``chunk`` event per
+    generated piece of text, then ``done`` with the saved assistant message.
+    If generation fails part way, an ``error`` event comes before ``done``
+    with whatever was generated. If the client goes away mid-stream, whatever
+    was generated is still saved.
+    """
+    # Checks the chat is the user's (404) before anything is charged or generated
+    context = await get_chat_context(db, chat_id=chat_id, user_id=current_user.id)
+    period = await consume_quota(db, current_user, "messages")
+    user_message = await add_message(
         db,
         chat_id=chat_id,
         user_id=current_user.id,
-        content=ai_response,
-        is_user=False
+        content=message.content,
+        is_user=True
     )
-    
-    return [user_message, ai_message]
\ No newline at end of file
+    user_payload = _message_payload(user_message)
+    positions = await get_natal_positions(db, current_user.id)
+    chunks = get_response_backend().stream(message.content, current_user.username, positions, context)
+
+    async def event_stream():
+        yield _sse_event("message", user_payload)
+
+        generated = []
+        error = None
+        failed = completed = False
+        try:
+            async for chunk in chunks:
+                if await request.is_disconnected():
+                    break
+                generated.append(chunk)
+                yield _sse_event("chunk", {"content": chunk})
+            completed = True
+        except HTTPException as exc:
+            error = exc.detail
+            failed = True
+        except Exception:
+            failed = True
+            raise
+        finally:
+            ai_message = await _finish_reply(chunks, chat_id, current_user, generated, failed, period)
+        if error is not None:
+            yield _sse_event("error", {"detail": error})
+        if (completed or error is not None) and ai_message is not None:
+            yield _sse_event("done", _message_payload(ai_message))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.websocket("/{chat_id}/ws")
+async def chat_socket(websocket: WebSocket, chat_id: int, token: str = Query(...)):
+    """Chat over a WebSocket, authenticated once when the connection opens.
+
+    Pass the access token as the ``token`` query parameter. Send
+    ``{"type": "message", "content": ...}``; the reply arrives as a ``message``
+    frame with the saved user message, ``chunk`` frames with generated text,
+    then ``done`` with the saved assistant message. Messages are answered in
+    order; a client that has ``WS_MAX_PENDING_MESSAGES`` of them waiting gets
+    an ``error`` frame instead. The server sends ``ping`` every
+    ``WS_HEARTBEAT_INTERVAL`` seconds (clients may send ``ping`` too) and
+    closes connections that stay silent for ``WS_IDLE_TIMEOUT`` seconds or
+    outlive their token.
+    """
+    async with AsyncSessionLocal() as db:
+        user = await get_user_from_token(db, token)
+        if user is None or not user.is_verified:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        try:
+            await get_chat(db, chat_id=chat_id, user_id=user.id)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        user_id, user_name = user.id, user.username
+    token_expiry = jwt.get_unverified_claims(token)["exp"]
+
+    await websocket.accept()
+    send_lock = asyncio.Lock()
+    inbox: "asyncio.Queue[str]" = asyncio.Queue(maxsize=settings.WS_MAX_PENDING_MESSAGES)
+    last_seen = time.monotonic()
+
+    async def send(frame_type: str, **data) -> None:
+        async with send_lock:
+            await websocket.send_text(json.dumps(jsonable_encoder({"type": frame_type, **data})))
+
+    async def receive() -> None:
+        nonlocal last_seen
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+                frame_type = frame.get("type")
+            except (ValueError, AttributeError):
+                await send("error", detail="Frames must be JSON objects with a 'type'")
+                continue
+            last_seen = time.monotonic()
+            if frame_type == "ping":
+                await send("pong")
+            elif frame_type == "message":
+                content = frame.get("content")
+                if not isinstance(content, str) or not content.strip():
+                    await send("error", detail="Message content is required")
+                    continue
+                try:
+                    inbox.put_nowait(content)
+                except asyncio.QueueFull:
+                    await send("error", detail="Too many messages waiting for a reply", content=content)
+            elif frame_type != "pong":
+                await send("error", detail=f"Unknown frame type {frame_type!r}")
+
+    async def reply() -> None:
+        while True:
+            content = await inbox.get()
+            # A short session per message; no connection is held while the socket idles
+            async with AsyncSessionLocal() as db:
+                try:
+                    context = await get_chat_context(db, chat_id=chat_id, user_id=user_id)
+                    period = await consume_quota(db, user, "messages")
+                    user_message = await add_message(db, chat_id=chat_id, user_id=user_id, content=content)
+                except HTTPException as exc:
+                    await send("error", detail=exc.detail)
+                    await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                    return
+                positions = await get_natal_positions(db, user_id)
+            await send("message", message=_message_payload(user_message))
+
+            generated = []
+            chunks = get_response_backend().stream(content, user_name, positions, context)
+            failed = False
+            try:
+                async for chunk in chunks:
+                    generated.append(chunk)
+                    await send("chunk", content=chunk)
+            except HTTPException as exc:
+                failed = True
+                await send("error", detail=exc.detail)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                ai_message = await _finish_reply(chunks, chat_id, user, generated, failed, period)
+            if ai_message is not None:
+                await send("done", message=_message_payload(ai_message))
+
+    async def heartbeat() -> None:
+        while True:
+            await asyncio.sleep(settings.WS_HEARTBEAT_INTERVAL)
+            if time.time() >= token_expiry:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+            if time.monotonic() - last_seen > settings.WS_IDLE_TIMEOUT:
+                await websocket.close(code=status.WS_1001_GOING_AWAY)
+                return
+            await send("ping")
+
+    tasks = [asyncio.create_task(coro) for coro in (receive(), reply(), heartbeat())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    for result in results:
+        if isinstance(result, Exception) and not isinstance(result, (WebSocketDisconnect, RuntimeError)):
+            raise result
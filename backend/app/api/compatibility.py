@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends
+from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List
+
+import numpy as np
+
+from app.schemas.user import User
+from app.api.auth import require_tier
+from app.models.user import SubscriptionTier
+from app.services.ephemeris import ecliptic_longitudes, BODIES
+from app.services.synastry import score_batch, synastry_report
+
+router = APIRouter(prefix="/compatibility", tags=["compatibility"])
+
+MAX_CANDIDATES = 10000
+
+class CompatibilityRequest(BaseModel):
+    birth_a: datetime
+    birth_b: datetime
+
+class Aspect(BaseModel):
+    body_a: str
+    body_b: str
+    aspect: str
+    orb: float
+    harmonious: bool
+    weight: float
+
+class CompatibilityReport(BaseModel):
+    score: float
+    aspects: List[Aspect]
+
+class BatchCompatibilityRequest(BaseModel):
+    birth: datetime
+    candidates: List[datetime] = Field(..., max_length=MAX_CANDIDATES)
+
+class BatchCompatibilityResponse(BaseModel):
+    scores: List[float]
+
+def _charts(births: List[datetime]) -> np.ndarray:
+    """Natal charts for many birth moments at once, shape ``(N, bodies)``."""
+    longitudes = ecliptic_longitudes(births)
+    return np.stack([longitudes[b] for b in BODIES], axis=-1)
+
+@router.post("/", response_model=CompatibilityReport)
+def compatibility_report(
+    request: CompatibilityRequest,
+    current_user: User = Depends(require_tier(SubscriptionTier.PROFESSIONAL))
+):
+    """Compare two birth charts aspect by aspect"""
+    charts = _charts([request.birth_a, request.birth_b])
+    return synastry_report(charts[0], charts[1])
+
+@router.post("/batch", response_model=BatchCompatibilityResponse)
+def compatibility_batch(
+    request: BatchCompatibilityRequest,
+    current_user: User = Depends(require_tier(SubscriptionTier.PROFESSIONAL))
+):
+    """Score one birth chart against many candidates"""
+    if not request.candidates:
+        return {"scores": []}
+    charts = _charts([request.birth] + request.candidates)
+    scores = score_batch(charts[0], charts[1:])
+    return {"scores": np.round(scores, 1).tolist()}
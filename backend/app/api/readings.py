@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.db.base import get_async_db
+from app.schemas.user import User, DailyReading
+from app.services.reading import get_user_reading
+from app.api.auth import require_tier
+from app.models.user import SubscriptionTier
+
+router = APIRouter(prefix="/readings", tags=["readings"])
+
+@router.get("/daily", response_model=DailyReading)
+async def read_daily_reading(
+    day: Optional[date] = Query(None),
+    current_user: User = Depends(require_tier(SubscriptionTier.PREMIUM)),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the user's personalized forecast for a day (defaults to today, UTC)"""
+    today = datetime.utcnow().date()
+    if day is None:
+        day = today
+    # Each day is generated and stored once per user, so don't let callers walk the calendar
+    elif abs((day - today).days) > settings.READING_DAY_RANGE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"day must be within {settings.READING_DAY_RANGE} days of today",
+        )
+    return await get_user_reading(db, current_user, day)
@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Body
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import List
 from enum import Enum
 
-from app.db.base import get_db
+from app.db.base import get_async_db
 from app.schemas.user import User
 from app.services.user import update_subscription
 from app.api.auth import get_current_verified_user
@@ -91,7 +91,7 @@ def get_subscription_plans():
 async def subscribe(
     payment: PaymentRequest,
     current_user: User = Depends(get_current_verified_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Process subscription payment and update user subscription"""
     
@@ -111,7 +111,7 @@ async def subscribe(
         )
     
     # Update user subscription
-    update_subscription(
+    await update_subscription(
         db, 
         user_id=current_user.id, 
         tier=payment.tier,
@@ -0,0 +1,100 @@
+"""
+Move old chat messages into compressed archive blocks.
+
+Run from the backend directory:
+
+    python -m app.archive_messages --days 30
+
+Messages older than the cutoff are packed per chat into blocks of up to
+``MESSAGE_ARCHIVE_BLOCK_SIZE`` rows (see ``app.services.archive``), written to
+``message_archives`` and deleted from ``messages`` in the same transaction, so
+an interrupted run simply continues on the next start. On Postgres, let
+autovacuum (or a manual VACUUM) reclaim the freed pages afterwards.
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.db.base import Base, SessionLocal, engine
+from app.models.user import Message, MessageArchive
+from app.services.archive import compress, pack_messages
+
+def archive(days: int, block_size: int, chat_batch_size: int) -> None:
+    Base.metadata.create_all(bind=engine)
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    last_chat_id = 0
+    archived = 0
+    blocks = 0
+    raw_bytes = 0
+    stored_bytes = 0
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        while True:
+            # Keyset over chats that still have messages past the cutoff
+            chat_ids = db.scalars(
+                select(Message.chat_id).where(Message.created_at < cutoff, Message.chat_id > last_chat_id)
+                .group_by(Message.chat_id).order_by(Message.chat_id).limit(chat_batch_size)
+            ).all()
+            if not chat_ids:
+                break
+
+            for chat_id in chat_ids:
+                while True:
+                    rows = db.execute(
+                        select(Message.id, Message.created_at, Message.is_user, Message.content)
+                        .where(Message.chat_id == chat_id, Message.created_at < cutoff)
+                        .order_by(Message.created_at, Message.id).limit(block_size)
+                    ).all()
+                    if not rows:
+                        break
+                    packed = pack_messages(rows)
+                    codec, data = compress(packed)
+                    first, last = rows[0], rows[-1]
+                    db.add(MessageArchive(
+                        chat_id=chat_id,
+                        first_created_at=first.created_at,
+                        first_message_id=first.id,
+                        last_created_at=last.created_at,
+                        last_message_id=last.id,
+                        message_count=len(rows),
+                        codec=codec,
+                        data=data,
+                    ))
+                    db.execute(delete(Message).where(Message.id.in_([row.id for row in rows])))
+                    db.commit()
+                    archived += len(rows)
+                    blocks += 1
+                    raw_bytes += len(packed)
+                    stored_bytes += len(data)
+
+            last_chat_id = chat_ids[-1]
+            elapsed = time.perf_counter() - started
+            print(f"{archived} messages in {blocks} blocks, {archived / elapsed:.0f} messages/s")
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    rate = archived / elapsed if elapsed else 0.0
+    ratio = raw_bytes / stored_bytes if stored_bytes else 0.0
+    print(
+        f"Done: archived {archived} messages older than {cutoff:%Y-%m-%d %H:%M} into {blocks} blocks "
+        f"in {elapsed:.1f}s ({rate:.0f} messages/s, {ratio:.1f}x compression)"
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=settings.MESSAGE_ARCHIVE_AFTER_DAYS,
+                        help="Archive messages older than this many days")
+    parser.add_argument("--block-size", type=int, default=settings.MESSAGE_ARCHIVE_BLOCK_SIZE,
+                        help="Messages per archive block")
+    parser.add_argument("--chat-batch-size", type=int, default=1000, help="Chats fetched per batch")
+    args = parser.parse_args()
+    archive(args.days, args.block_size, args.chat_batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Resume points for the batch jobs.
+
+A checkpoint records the last user id a job finished for a given date. It is
+written to a temporary file and moved into place, so an interrupted write
+never leaves a truncated checkpoint behind.
+"""
+
+import json
+import os
+from datetime import date
+
+def load_checkpoint(path: str, day: date) -> int:
+    """Last user id already done for ``day``, or 0 to start from scratch."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("date") != day.isoformat():
+        return 0
+    return checkpoint["last_user_id"]
+
+def save_checkpoint(path: str, day: date, last_user_id: int) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"date": day.isoformat(), "last_user_id": last_user_id}, f)
+    os.replace(tmp_path, path)
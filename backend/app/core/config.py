@@ -7,8 +7,16 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = secrets.token_urlsafe(32)
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8  # 8 days
+    # Authenticated users cached per access token; other workers see changes after at most the TTL
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: float = 60.0
     DATABASE_URL: str
 
+    # Password hashing, run in a process pool (see app.services.passwords)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # defaults to the CPU count
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
     # Auth providers
     GOOGLE_CLIENT_ID: Optional[str] = None
     GOOGLE_CLIENT_SECRET: Optional[str] = None
@@ -23,9 +31,64 @@ class Settings(BaseSettings):
     SMTP_USERNAME: str
     SMTP_PASSWORD: str
     EMAIL_FROM: str
+    # Where links in emails point
+    FRONTEND_URL: str = "http://localhost:3000"
+    SMTP_STARTTLS: bool = True
+    SMTP_SSL_TLS: bool = False
+    SMTP_USE_CREDENTIALS: bool = True
+    SMTP_VALIDATE_CERTS: bool = True
+
+    # Outgoing mail dispatcher (see app.services.mailer)
+    SMTP_POOL_SIZE: int = 2
+    SMTP_BATCH_SIZE: int = 50
+    SMTP_QUEUE_SIZE: int = 10000
+    SMTP_MAX_ATTEMPTS: int = 4
+    SMTP_TIMEOUT: float = 30.0
+    SMTP_IDLE_TIMEOUT: float = 60.0
+    SMTP_RATE_LIMIT: Optional[float] = None  # messages per second across connections
     
     # Chat settings
+    # Monthly quotas on the free plan
     MAX_FREE_CHATS: int = 10
+    MAX_FREE_MESSAGES: int = 200
+    MESSAGE_PAGE_SIZE: int = 50
+    MESSAGE_PAGE_MAX: int = 200
+    CHAT_PREVIEW_LENGTH: int = 120
+    READING_CACHE_MAXSIZE: int = 1024
+    # Daily readings can be asked for this many days either side of today (UTC)
+    READING_DAY_RANGE: int = 7
+    NATAL_CHART_CACHE_SIZE: int = 10000
+    RESPONSE_CORPUS_PATH: Optional[str] = None
+    RESPONSE_CORPUS_RELOAD_INTERVAL: float = 5.0
+
+    # Messages older than this are moved to compressed archive blocks by app.archive_messages
+    MESSAGE_ARCHIVE_AFTER_DAYS: int = 30
+    MESSAGE_ARCHIVE_BLOCK_SIZE: int = 1000
+    MESSAGE_ARCHIVE_CACHE_SIZE: int = 256
+
+    # Conversation context sent with each prompt (see app.services.context)
+    CHAT_CONTEXT_TURNS: int = 20
+    CHAT_CONTEXT_WINDOW_CHARS: int = 8000
+    CHAT_CONTEXT_SUMMARY_CHARS: int = 2000
+
+    # Chat WebSocket
+    WS_HEARTBEAT_INTERVAL: float = 20.0
+    WS_IDLE_TIMEOUT: float = 60.0
+    WS_MAX_PENDING_MESSAGES: int = 4
+
+    # Write-behind message ingestion (see app.services.ingest)
+    MESSAGE_WRITE_BEHIND: bool = False
+    MESSAGE_BUFFER_SIZE: int = 10000
+    MESSAGE_FLUSH_SIZE: int = 500
+    MESSAGE_FLUSH_INTERVAL: float = 0.05
+    MESSAGE_ENQUEUE_TIMEOUT: float = 2.0
+    MESSAGE_FLUSH_MAX_ATTEMPTS: int = 8
+
+    # Response generation ("mock" or "http")
+    RESPONSE_BACKEND: str = "mock"
+    RESPONSE_BACKEND_URL: Optional[str] = None
+    RESPONSE_BACKEND_TIMEOUT: float = 30.0
+    RESPONSE_BACKEND_MAX_CONCURRENCY: int = 16
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -7,9 +8,37 @@ from app.core.config import settings
 # Create SQLAlchemy engine
 engine = create_engine(settings.DATABASE_URL)
 
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite leaves foreign keys, and so ON DELETE CASCADE, off unless asked per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _async_database_url(url: str) -> str:
+    """Point the configured URL at the async driver for the same database."""
+    for prefix, driver in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(prefix):
+            return driver + url[len(prefix):]
+    return url
+
+# Async engine for request handlers; the sync engine stays for scripts and batch jobs
+async_engine = create_async_engine(_async_database_url(settings.DATABASE_URL))
+
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _enable_sqlite_foreign_keys)
+
+# Objects stay usable after commit, since lazy refreshes can't happen implicitly
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
@@ -21,15 +50,25 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def dialect_insert(db):
+    """Return the ``insert`` construct with ON CONFLICT support for the session's database."""
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
 # Function to initialize database with seed data
 def init_db(db):
     """Seed the database with initial data."""
     from app.models.user import User, AuthProvider, SubscriptionTier
     from sqlalchemy import text
     from datetime import datetime, timedelta
-    from passlib.context import CryptContext
-    
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    from app.core.security import get_password_hash
     
     # Check if users table already has data
     result = db.execute(text("SELECT COUNT(*) FROM users")).scalar()
@@ -39,7 +78,7 @@ def init_db(db):
         admin_user = User(
             email="admin@astrological-ai.com",
             username="Admin",
-            hashed_password=pwd_context.hash("admin123"),
+            hashed_password=get_password_hash("admin123"),
             is_active=True,
             is_verified=True,
             auth_provider=AuthProvider.EMAIL,
@@ -51,7 +90,7 @@ def init_db(db):
         demo_user = User(
             email="user@example.com",
             username="DemoUser",
-            hashed_password=pwd_context.hash("password123"),
+            hashed_password=get_password_hash("password123"),
             is_active=True,
             is_verified=True,
             auth_provider=AuthProvider.EMAIL,
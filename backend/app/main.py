@@ -1,10 +1,17 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api import auth, chat, subscription
+from app.api import auth, chat, compatibility, readings, subscription
 from app.core.config import settings
-from app.db.base import get_db, Base, engine, SessionLocal, init_db
+from app.db.base import get_async_db, async_engine, Base, engine, SessionLocal, init_db
+from app.services.astro import daily_reading_cache
+from app.services.generation import close_response_backend
+from app.services.ingest import close_message_writer, get_message_writer
+from app.services.mailer import close_email_dispatcher
+from app.services.passwords import close_password_hasher, get_password_hasher
+from app.services.user import principal_cache
 
 # Create tables
 Base.metadata.create_all(bind=engine)
@@ -34,16 +41,38 @@ app.add_middleware(
 app.include_router(auth.router, prefix=settings.API_V1_STR)
 app.include_router(chat.router, prefix=settings.API_V1_STR)
 app.include_router(subscription.router, prefix=settings.API_V1_STR)
+app.include_router(readings.router, prefix=settings.API_V1_STR)
+app.include_router(compatibility.router, prefix=settings.API_V1_STR)
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_response_backend()
+    # Flush buffered messages before the engine goes away
+    await close_message_writer()
+    # Send queued email before exiting
+    await close_email_dispatcher()
+    await async_engine.dispose()
+    close_password_hasher()
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Astrological AI Assistant API"}
 
 @app.get("/health")
-async def health_check(db: Session = Depends(get_db)):
+async def health_check(db: AsyncSession = Depends(get_async_db)):
     try:
         # Try to execute a simple query
-        db.execute("SELECT 1")
-        return {"status": "ok", "database": "connected"}
+        await db.execute(text("SELECT 1"))
+        health = {
+            "status": "ok",
+            "database": "connected",
+            "reading_cache": daily_reading_cache.stats(),
+            "principal_cache": principal_cache.stats(),
+            "password_hasher": get_password_hasher().stats(),
+        }
+        writer = get_message_writer()
+        if writer:
+            health["message_writer"] = writer.stats()
+        return health
     except Exception as e:
         return {"status": "error", "database": "disconnected", "detail": str(e)}
\ No newline at end of file
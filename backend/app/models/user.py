@@ -1,6 +1,7 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Table, DateTime, Text, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import DDL, JSON, event, Boolean, Column, ForeignKey, Integer, String, Table, DateTime, Date, Time, Float, LargeBinary, Text, Enum, Index, UniqueConstraint
+from sqlalchemy.orm import deferred, relationship
 from sqlalchemy.sql import func
+from datetime import datetime
 import enum
 from app.db.base import Base
 
@@ -18,6 +19,9 @@ class SubscriptionTier(enum.Enum):
 
 class User(Base):
     __tablename__ = "users"
+    # Fetch server-generated timestamps in the INSERT/UPDATE itself (RETURNING),
+    # since async sessions can't lazily reload expired attributes
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
@@ -29,30 +33,127 @@ class User(Base):
     provider_user_id = Column(String, nullable=True)
     subscription_tier = Column(Enum(SubscriptionTier), default=SubscriptionTier.FREE)
     subscription_expiry = Column(DateTime, nullable=True)
+    birth_date = Column(Date, nullable=True)
+    birth_time = Column(Time, nullable=True)  # UTC
+    birth_place = Column(String, nullable=True)
+    birth_latitude = Column(Float, nullable=True)
+    birth_longitude = Column(Float, nullable=True)
+    natal_chart = Column(LargeBinary, nullable=True)  # see app.services.natal
+    daily_digest_opt_in = Column(Boolean, default=False, server_default="0", nullable=False)
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
 
     chats = relationship("Chat", back_populates="user")
+    daily_readings = relationship("DailyReading", back_populates="user")
     
 class Chat(Base):
     __tablename__ = "chats"
+    __mapper_args__ = {"eager_defaults": True}
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     title = Column(String, default="New Chat")
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, onupdate=func.now())
+    # Rolling generation context kept by app.services.context; deferred so chat listings don't load it.
+    # NULL turns (chats older than the feature) are rebuilt from the latest messages on first use.
+    context_summary = deferred(Column(Text))
+    context_turns = deferred(Column(JSON, default=list))
     
     user = relationship("User", back_populates="chats")
-    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan")
+    # The database cascades chat deletes, so the ORM doesn't load children just to delete them
+    messages = relationship("Message", back_populates="chat", cascade="all, delete-orphan", passive_deletes=True)
+    archives = relationship("MessageArchive", back_populates="chat", cascade="all, delete-orphan", passive_deletes=True)
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Serves keyset pagination over (created_at, id) within a chat
+        Index("ix_messages_chat_created_id", "chat_id", "created_at", "id"),
+        # Write-behind reserves ids through sqlite_sequence (see app.services.ingest)
+        {"sqlite_autoincrement": True},
+    )
     
     id = Column(Integer, primary_key=True, index=True)
-    chat_id = Column(Integer, ForeignKey("chats.id"))
+    chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"))
     is_user = Column(Boolean, default=True)
     content = Column(Text)
-    created_at = Column(DateTime, server_default=func.now())
+    # Set client-side with microseconds so cursor comparisons are exact on every backend
+    created_at = Column(DateTime, default=datetime.utcnow, server_default=func.now())
     
-    chat = relationship("Chat", back_populates="messages")
\ No newline at end of file
+    chat = relationship("Chat", back_populates="messages")
+
+# Full-text search over message content (see app.services.search). The search
+# structures live outside the mapped columns so each backend gets its own:
+# a generated tsvector with a GIN index on Postgres, and an external-content
+# FTS5 table kept current by triggers on SQLite.
+_MESSAGE_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE messages ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED",
+        "CREATE INDEX ix_messages_search_vector ON messages USING gin (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE messages_fts USING fts5("
+        "content, content='messages', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN "
+        "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+        "CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+        "CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages BEGIN "
+        "INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+        "INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content); END",
+    ],
+}
+for _dialect, _statements in _MESSAGE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(Message.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+event.listen(Message.__table__, "before_drop", DDL("DROP TABLE IF EXISTS messages_fts").execute_if(dialect="sqlite"))
+
+class MessageArchive(Base):
+    """A compressed block of a chat's old messages, moved out of ``messages``
+    by ``app.archive_messages`` (format in ``app.services.archive``)."""
+    __tablename__ = "message_archives"
+    __table_args__ = (
+        Index("ix_message_archives_chat_range", "chat_id", "last_created_at", "last_message_id"),
+        # Decoded blocks are cached by id, so ids of deleted blocks must never come back
+        {"sqlite_autoincrement": True},
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    chat_id = Column(Integer, ForeignKey("chats.id", ondelete="CASCADE"), nullable=False)
+    # Keyset bounds of the block, so pages can skip blocks without decoding them
+    first_created_at = Column(DateTime, nullable=False)
+    first_message_id = Column(Integer, nullable=False)
+    last_created_at = Column(DateTime, nullable=False)
+    last_message_id = Column(Integer, nullable=False)
+    message_count = Column(Integer, nullable=False)
+    codec = Column(String, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    chat = relationship("Chat", back_populates="archives")
+
+class UsageCounter(Base):
+    """How much of a metered feature a user has used in a period (see app.services.usage)."""
+    __tablename__ = "usage_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    metric = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+class DailyReading(Base):
+    __tablename__ = "daily_readings"
+    __table_args__ = (
+        UniqueConstraint("user_id", "reading_date", name="uq_daily_readings_user_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    reading_date = Column(Date, nullable=False)
+    sign = Column(String, nullable=True)
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    user = relationship("User", back_populates="daily_readings")
\ No newline at end of file
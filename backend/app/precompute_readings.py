@@ -0,0 +1,74 @@
+"""
+Precompute personalized daily readings for every active user.
+
+Run from the backend directory:
+
+    python -m app.precompute_readings --date 2024-01-31 --workers 4
+
+Readings are generated across a process pool and bulk-inserted into
+``daily_readings``. Progress is checkpointed after every batch, so an
+interrupted run resumes where it stopped when started again for the same date.
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from app.core.checkpoint import load_checkpoint, save_checkpoint
+from app.db.base import Base, SessionLocal, engine
+from app.models.user import User
+from app.services.reading import compute_reading, save_readings
+
+def precompute(day: date, workers: Optional[int], batch_size: int, checkpoint: str) -> None:
+    Base.metadata.create_all(bind=engine)
+    last_user_id = load_checkpoint(checkpoint, day)
+    if last_user_id:
+        print(f"Resuming {day} after user {last_user_id}")
+
+    workers = workers or os.cpu_count() or 1
+    processed = 0
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # Keyset pagination keeps each batch query on the primary key index
+                users = db.query(User.id, User.username, User.natal_chart).filter(
+                    User.is_active.is_(True), User.id > last_user_id
+                ).order_by(User.id).limit(batch_size).all()
+                if not users:
+                    break
+
+                jobs = [(user_id, username or "", chart, day) for user_id, username, chart in users]
+                chunksize = max(1, len(jobs) // (4 * workers))
+                rows = list(pool.map(compute_reading, jobs, chunksize=chunksize))
+                save_readings(db, rows)
+
+                last_user_id = users[-1].id
+                save_checkpoint(checkpoint, day, last_user_id)
+                processed += len(rows)
+                elapsed = time.perf_counter() - started
+                print(f"{processed} readings, {processed / elapsed:.0f} users/s")
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"Done: {processed} readings for {day} in {elapsed:.1f}s ({rate:.0f} users/s)")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--date", type=date.fromisoformat,
+                        default=datetime.utcnow().date() + timedelta(days=1),
+                        help="Reading date (YYYY-MM-DD), defaults to tomorrow UTC")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Users per batch")
+    parser.add_argument("--checkpoint", default=".precompute_readings.json", help="Checkpoint file")
+    args = parser.parse_args()
+    precompute(args.date, args.workers, args.batch_size, args.checkpoint)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date, time
 from app.models.user import AuthProvider, SubscriptionTier
 
 class UserBase(BaseModel):
@@ -26,10 +26,21 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
-class User(UserBase):
+class BirthInfo(BaseModel):
+    birth_date: Optional[date] = None
+    birth_time: Optional[time] = None  # UTC
+    birth_place: Optional[str] = None
+    birth_latitude: Optional[float] = Field(None, ge=-90, le=90)
+    birth_longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+class DigestPreference(BaseModel):
+    daily_digest_opt_in: bool
+
+class User(UserBase, BirthInfo):
     id: int
     is_active: bool
     is_verified: bool
+    daily_digest_opt_in: bool = False
     auth_provider: AuthProvider
     subscription_tier: SubscriptionTier
     subscription_expiry: Optional[datetime] = None
@@ -60,15 +71,62 @@ class Message(MessageBase):
     class Config:
         orm_mode = True
 
-class Chat(ChatBase):
+class ChatMeta(ChatBase):
     id: int
     user_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    
+    class Config:
+        orm_mode = True
+
+class Chat(ChatMeta):
     messages: List[Message] = []
+
+class ChatSummary(ChatBase):
+    id: int
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    last_message_at: Optional[datetime] = None
     
     class Config:
         orm_mode = True
 
+class ChatBulkDelete(BaseModel):
+    chat_ids: List[int] = Field(default_factory=list, max_length=1000)
+    # Delete every chat of the user instead, e.g. when closing the account
+    all: bool = False
+
+class MessagePage(BaseModel):
+    messages: List[Message]
+    has_more: bool
+    # Pass as ``before`` to page towards older messages, or as ``after`` for newer ones
+    before_cursor: Optional[str] = None
+    after_cursor: Optional[str] = None
+
+class SearchHit(BaseModel):
+    message_id: int
+    chat_id: int
+    chat_title: Optional[str] = None
+    is_user: bool
+    created_at: datetime
+    # HTML: the message text escaped, with matched terms wrapped in <mark>...</mark>
+    snippet: str
+    score: float
+
+class SearchPage(BaseModel):
+    results: List[SearchHit]
+    next_cursor: Optional[str] = None
+
 class UserWithChats(User):
-    chats: List[Chat] = []
\ No newline at end of file
+    chats: List[Chat] = []
+
+class DailyReading(BaseModel):
+    reading_date: date
+    sign: Optional[str] = None
+    content: str
+    
+    class Config:
+        orm_mode = True
\ No newline at end of file
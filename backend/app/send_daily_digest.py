@@ -0,0 +1,171 @@
+"""
+Email every opted-in user their daily reading.
+
+Run from the backend directory:
+
+    python -m app.send_daily_digest --date 2024-01-31 --workers 4 --connections 4 --rate 50
+
+Users who are active, verified and have ``daily_digest_opt_in`` set are read
+in keyset batches. Readings already stored by ``precompute_readings`` are
+reused; the rest are generated across a process pool and saved. Emails go out
+over ``--connections`` persistent SMTP connections, at most ``--rate``
+messages per second, while the next batch is being prepared.
+
+Progress is checkpointed once a batch has been handed to the SMTP server, so
+an interrupted run resumes where it stopped when started again for the same
+date. Users in the batch that was being sent when the run stopped may get
+their email twice.
+
+To try it against a local sink, set ``SMTP_SERVER``/``SMTP_PORT`` to the
+sink with ``SMTP_STARTTLS`` and ``SMTP_USE_CREDENTIALS`` off.
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from email.message import EmailMessage
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.checkpoint import load_checkpoint, save_checkpoint
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal, Base, engine
+from app.models.user import DailyReading, User
+from app.services.mailer import dispatcher_from_settings
+from app.services.reading import compute_reading, save_readings
+from app.utils.email import build_email, render_template
+
+def _compute_readings(jobs: List[tuple]) -> List[Dict]:
+    return [compute_reading(job) for job in jobs]
+
+async def _readings_for(
+    db: AsyncSession, pool: ProcessPoolExecutor, workers: int, users: List, day: date
+) -> Tuple[Dict[int, Dict], int]:
+    """Readings for ``users`` keyed by user id, and how many of them had to be generated."""
+    stored = (await db.execute(
+        select(DailyReading.user_id, DailyReading.sign, DailyReading.content).where(
+            DailyReading.reading_date == day,
+            DailyReading.user_id.in_([user.id for user in users]),
+        )
+    )).all()
+    readings = {user_id: {"sign": sign, "content": content} for user_id, sign, content in stored}
+
+    jobs = [(user.id, user.username or "", user.natal_chart, day) for user in users if user.id not in readings]
+    if jobs:
+        loop = asyncio.get_running_loop()
+        size = max(1, len(jobs) // (4 * workers))
+        chunks = await asyncio.gather(*(
+            loop.run_in_executor(pool, _compute_readings, jobs[i:i + size]) for i in range(0, len(jobs), size)
+        ))
+        rows = [row for chunk in chunks for row in chunk]
+        await db.run_sync(save_readings, rows)
+        readings.update((row["user_id"], row) for row in rows)
+    return readings, len(jobs)
+
+def _render_emails(users: List, readings: Dict[int, Dict], day: date, subject: str) -> List[EmailMessage]:
+    # The profile page's Settings tab has the digest opt-out
+    settings_url = f"{settings.FRONTEND_URL}/profile?tab=settings"
+    messages = []
+    for user in users:
+        reading = readings[user.id]
+        body = render_template(
+            "daily_digest.html",
+            user_name=user.username or "there",
+            day=day,
+            sign=reading["sign"],
+            content=reading["content"],
+            settings_url=settings_url,
+            current_year=day.year,
+        )
+        messages.append(build_email(user.email, subject, body))
+    return messages
+
+async def send_digest(
+    day: date,
+    workers: Optional[int],
+    batch_size: int,
+    connections: int,
+    rate: Optional[float],
+    checkpoint: str
+) -> None:
+    Base.metadata.create_all(bind=engine)
+    last_user_id = load_checkpoint(checkpoint, day)
+    if last_user_id:
+        print(f"Resuming {day} after user {last_user_id}")
+
+    workers = workers or os.cpu_count() or 1
+    subject = f"{settings.PROJECT_NAME} - Your reading for {day:%B} {day.day}"
+    # Small batches keep the connections evenly loaded at campaign scale
+    dispatcher = dispatcher_from_settings(pool_size=connections, rate_limit=rate, batch_size=10)
+    processed = generated = 0
+    queued_through = None
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    # Everything below awaits rather than blocks, so the dispatcher keeps
+    # sending the previous batch while the next one is prepared
+    try:
+        async with AsyncSessionLocal() as db:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                while True:
+                    users = (await db.execute(
+                        select(User.id, User.email, User.username, User.natal_chart).where(
+                            User.is_active.is_(True),
+                            User.is_verified.is_(True),
+                            User.daily_digest_opt_in.is_(True),
+                            User.id > last_user_id,
+                        ).order_by(User.id).limit(batch_size)
+                    )).all()
+
+                    messages = []
+                    if users:
+                        readings, new_readings = await _readings_for(db, pool, workers, users, day)
+                        generated += new_readings
+                        # Rendering is CPU work; a thread leaves the event loop to the SMTP workers
+                        messages = await loop.run_in_executor(None, _render_emails, users, readings, day, subject)
+
+                    if queued_through is not None:
+                        await dispatcher.join()
+                        save_checkpoint(checkpoint, day, queued_through)
+                        elapsed = time.perf_counter() - started
+                        stats = dispatcher.stats()
+                        print(f"{processed} users, {stats['sent']} sent, {stats['failed']} failed, "
+                              f"{processed / elapsed:.0f} users/s")
+                    if not users:
+                        break
+
+                    for message in messages:
+                        await dispatcher.send(message)
+                    last_user_id = queued_through = users[-1].id
+                    processed += len(users)
+    finally:
+        await dispatcher.aclose()
+
+    elapsed = time.perf_counter() - started
+    stats = dispatcher.stats()
+    throughput = processed / elapsed if elapsed else 0.0
+    print(f"Done: {processed} users for {day} in {elapsed:.1f}s ({throughput:.0f} users/s); "
+          f"{stats['sent']} sent, {stats['failed']} failed, {stats['retries']} retries; "
+          f"{generated} readings generated, {processed - generated} reused; "
+          f"{stats['connections']} SMTP connections")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--date", type=date.fromisoformat, default=datetime.utcnow().date(),
+                        help="Reading date (YYYY-MM-DD), defaults to today UTC")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=500, help="Users per batch")
+    parser.add_argument("--connections", type=int, default=settings.SMTP_POOL_SIZE,
+                        help="Concurrent SMTP connections")
+    parser.add_argument("--rate", type=float, default=settings.SMTP_RATE_LIMIT,
+                        help="Maximum emails per second (default: unlimited)")
+    parser.add_argument("--checkpoint", default=".send_daily_digest.json", help="Checkpoint file")
+    args = parser.parse_args()
+    asyncio.run(send_digest(args.date, args.workers, args.batch_size, args.connections, args.rate, args.checkpoint))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Cold storage for old chat messages.
+
+``app.archive_messages`` moves messages older than
+``MESSAGE_ARCHIVE_AFTER_DAYS`` out of ``messages`` into ``message_archives``:
+one row per block of up to ``MESSAGE_ARCHIVE_BLOCK_SIZE`` consecutive
+messages of a chat, compressed with zstd when ``zstandard`` is installed and
+zlib otherwise. Archived messages are always older than a chat's hot ones,
+so reads that run past the hot table continue into the archive. Decoded
+blocks are cached per process; blocks never change once written.
+
+Packed layout (little-endian)::
+
+    version u8 | row count u32
+    per row: id i64 | created_at i64 (microseconds since 1970, UTC) | is_user u8 | length u32 | content utf-8
+"""
+
+import struct
+import zlib
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import Message, MessageArchive
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<BI")
+_ROW = struct.Struct("<qqBI")
+
+_EPOCH = datetime(1970, 1, 1)
+
+# (id, created_at, is_user, content)
+ArchivedRow = Tuple[int, datetime, bool, str]
+
+archive_cache = TTLCache(maxsize=settings.MESSAGE_ARCHIVE_CACHE_SIZE, ttl=60 * 60)
+
+def pack_messages(rows: Iterable[ArchivedRow]) -> bytes:
+    parts = []
+    count = 0
+    for message_id, created_at, is_user, content in rows:
+        encoded = (content or "").encode("utf-8")
+        micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+        parts.append(_ROW.pack(message_id, micros, bool(is_user), len(encoded)))
+        parts.append(encoded)
+        count += 1
+    return _HEADER.pack(FORMAT_VERSION, count) + b"".join(parts)
+
+def unpack_messages(data: bytes) -> List[ArchivedRow]:
+    version, count = _HEADER.unpack_from(data, 0)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported message archive version {version}")
+    rows = []
+    position = _HEADER.size
+    for _ in range(count):
+        message_id, micros, is_user, length = _ROW.unpack_from(data, position)
+        position += _ROW.size
+        content = data[position:position + length].decode("utf-8")
+        position += length
+        rows.append((message_id, _EPOCH + timedelta(microseconds=micros), bool(is_user), content))
+    return rows
+
+def compress(data: bytes) -> Tuple[str, bytes]:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 9)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd-compressed message archives")
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown message archive codec {codec!r}")
+
+async def _block_rows(db: AsyncSession, block_id: int) -> List[ArchivedRow]:
+    rows = archive_cache.get(block_id)
+    if rows is None:
+        codec, data = (await db.execute(
+            select(MessageArchive.codec, MessageArchive.data).where(MessageArchive.id == block_id)
+        )).one()
+        rows = unpack_messages(decompress(codec, data))
+        archive_cache.set(block_id, rows)
+    return rows
+
+async def get_archived_messages(
+    db: AsyncSession,
+    chat_id: int,
+    before: Optional[Tuple[datetime, int]] = None,
+    after: Optional[Tuple[datetime, int]] = None,
+    limit: Optional[int] = None
+) -> List[Message]:
+    """Archived messages of a chat in chronological order, as unsaved ``Message`` objects.
+
+    ``before``/``after`` are (created_at, id) keyset bounds. With ``limit``,
+    only the messages closest to the bound (or the newest, without one) are
+    returned, and only the blocks needed for them are decoded.
+    """
+    query = select(MessageArchive.id).where(MessageArchive.chat_id == chat_id)
+    if after:
+        query = query.where(tuple_(MessageArchive.last_created_at, MessageArchive.last_message_id) > after)
+        query = query.order_by(MessageArchive.last_created_at, MessageArchive.last_message_id)
+    else:
+        if before:
+            query = query.where(tuple_(MessageArchive.first_created_at, MessageArchive.first_message_id) < before)
+        query = query.order_by(MessageArchive.last_created_at.desc(), MessageArchive.last_message_id.desc())
+
+    found: List[ArchivedRow] = []
+    for block_id in (await db.scalars(query)).all():
+        rows = await _block_rows(db, block_id)
+        if after:
+            found.extend(row for row in rows if (row[1], row[0]) > after)
+        else:
+            found.extend(reversed([row for row in rows if before is None or (row[1], row[0]) < before]))
+        if limit is not None and len(found) >= limit:
+            break
+
+    if limit is not None:
+        found = found[:limit]
+    if not after:
+        found.reverse()
+    return [
+        Message(id=message_id, chat_id=chat_id, created_at=created_at, is_user=is_user, content=content)
+        for message_id, created_at, is_user, content in found
+    ]
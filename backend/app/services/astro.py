@@ -1,147 +1,153 @@
-import random
-from typing import Dict, List
-
-# Mock astrological responses for each zodiac sign
-MOCK_RESPONSES: Dict[str, List[str]] = {
-    "general": [
-        "The celestial bodies are aligned in your favor today. Trust your intuition and move forward with confidence.",
-        "The stars suggest a period of reflection. Take time to consider your path and make adjustments as needed.",
-        "The universe is sending you positive energy. Embrace new opportunities that come your way.",
-        "The planets indicate a time of transformation. Be open to change and personal growth.",
-        "The cosmic energies are supporting your endeavors. This is a good time to pursue your goals."
-    ],
-    "aries": [
-        "As a fiery Aries, your natural leadership is enhanced today. Take initiative on that project you've been considering.",
-        "Mars, your ruling planet, is energizing your confidence. Use this boost to overcome obstacles in your path.",
-        "Your Aries determination is particularly strong. Channel this energy into productive pursuits rather than impulsive actions.",
-        "The ram's courage is yours to harness today. Face challenges head-on and you'll likely succeed.",
-        "Your pioneering Aries spirit is highlighted. This is an excellent time to start new ventures or explore new ideas."
-    ],
-    "taurus": [
-        "As a grounded Taurus, your patience will be rewarded today. Stay consistent with your efforts.",
-        "Venus, your ruling planet, is enhancing your appreciation for beauty and comfort. Take time to enjoy life's pleasures.",
-        "Your Taurus stability is your strength now. Others may rely on your steadfast nature during turbulent times.",
-        "The bull's persistence is working in your favor. Continue methodically toward your goals, and you'll see progress.",
-        "Your practical Taurus approach is exactly what's needed. Trust your ability to create tangible results."
-    ],
-    "gemini": [
-        "As a versatile Gemini, your communication skills are particularly sharp today. Express your ideas confidently.",
-        "Mercury, your ruling planet, is boosting your mental agility. This is an excellent time for learning or teaching.",
-        "Your Gemini adaptability is a major asset now. Embrace change and you'll discover new opportunities.",
-        "The twins' curiosity is leading you to valuable insights. Follow your interests and expand your knowledge.",
-        "Your quick Gemini wit is especially charming today. Social connections will likely be rewarding and stimulating."
-    ],
-    "cancer": [
-        "As an intuitive Cancer, your emotional intelligence is heightened today. Trust your feelings about important matters.",
-        "The Moon, your ruling celestial body, is enhancing your nurturing nature. Supportive actions will strengthen relationships.",
-        "Your Cancer sensitivity is allowing you to perceive subtle energies. Pay attention to your inner voice and dreams.",
-        "The crab's protective instincts are strong now. Creating safe spaces for yourself and loved ones will bring comfort.",
-        "Your caring Cancer heart is opening to deeper connections. Allow yourself to be vulnerable with those who deserve your trust."
-    ],
-    "leo": [
-        "As a radiant Leo, your natural charisma is magnified today. Step into the spotlight with confidence.",
-        "The Sun, your ruling celestial body, is energizing your creative powers. Express yourself boldly and authentically.",
-        "Your Leo generosity will create positive ripple effects. Share your gifts and strengths with others.",
-        "The lion's courage is yours to embody now. Face any fears with the royal dignity that is your birthright.",
-        "Your warm Leo heart is attracting admirers. Relationships of all kinds are likely to flourish under your sunny influence."
-    ],
-    "virgo": [
-        "As a meticulous Virgo, your analytical skills are particularly sharp today. Your attention to detail will lead to excellence.",
-        "Mercury, your ruling planet, is enhancing your practical intelligence. Solutions to complex problems are within reach.",
-        "Your Virgo diligence is paying off in tangible ways. Continue refining your methods for even greater efficiency.",
-        "The maiden's healing touch is especially potent now. Consider how you might improve wellness for yourself and others.",
-        "Your discerning Virgo nature helps you separate what matters from distractions. Focus on quality over quantity."
-    ],
-    "libra": [
-        "As a harmonious Libra, your diplomatic skills are particularly valuable today. You can help bridge understanding between opposing views.",
-        "Venus, your ruling planet, is highlighting your appreciation for beauty and balance. Surround yourself with aesthetic pleasures.",
-        "Your Libra sense of fairness is guiding you toward equitable solutions. Trust your instinct for justice.",
-        "The scales are finding their balance in your relationships. Small adjustments now will prevent larger imbalances later.",
-        "Your charming Libra nature opens doors to social connections. Networking efforts are likely to be particularly fruitful."
-    ],
-    "scorpio": [
-        "As a powerful Scorpio, your intensity is focused and effective today. Channel your passion toward meaningful goals.",
-        "Pluto, your ruling planet, is deepening your transformative abilities. Embrace necessary endings that make way for new beginnings.",
-        "Your Scorpio perception sees beneath surface appearances. Trust your insights about hidden motivations and agendas.",
-        "The scorpion's protective nature is activated. Establish healthy boundaries while maintaining meaningful connections.",
-        "Your resourceful Scorpio nature finds value where others see only obstacles. Your ability to regenerate and transform is your greatest asset."
-    ],
-    "sagittarius": [
-        "As an adventurous Sagittarius, your optimism is especially inspiring today. Share your vision and elevate those around you.",
-        "Jupiter, your ruling planet, is expanding your horizons. New learning opportunities are appearing - follow your curiosity.",
-        "Your Sagittarius honesty is refreshing to those tired of pretense. Speak your truth with kindness and conviction.",
-        "The archer's aim is true now. Focus on your most important targets rather than scattering your energies.",
-        "Your philosophical Sagittarius nature is contemplating life's big questions. Make time for both adventure and reflection."
-    ],
-    "capricorn": [
-        "As an ambitious Capricorn, your discipline is your superpower today. Consistent efforts will yield impressive results.",
-        "Saturn, your ruling planet, is strengthening your foundation. Build methodically for lasting success.",
-        "Your Capricorn practicality cuts through illusions and fantasies. Your realistic approach will save time and resources.",
-        "The goat's steady climb continues to move you toward your summit. Each step matters, so maintain your patience.",
-        "Your responsible Capricorn nature earns respect from important connections. Your reliability is not going unnoticed."
-    ],
-    "aquarius": [
-        "As an innovative Aquarius, your unique perspective offers solutions others cannot see. Trust your unconventional thinking.",
-        "Uranus, your ruling planet, is sparking brilliant insights. Expect sudden clarity about matters that have confused you.",
-        "Your Aquarius humanitarian spirit is activated. Consider how your actions can benefit the collective good.",
-        "The water-bearer's independent nature requires freedom to explore. Create space for experiments and new ideas.",
-        "Your progressive Aquarius vision is particularly clear now. Don't hesitate to share ideas that seem ahead of their time."
-    ],
-    "pisces": [
-        "As an intuitive Pisces, your compassion creates healing spaces. Your sensitivity is a gift, not a limitation.",
-        "Neptune, your ruling planet, is enhancing your creative imagination. Artistic pursuits will be especially rewarding.",
-        "Your Pisces connection to spiritual dimensions offers guidance beyond rational thinking. Pay attention to synchronicities.",
-        "The fishes' adaptability helps you flow around obstacles rather than struggling against them. Flexibility is your strength now.",
-        "Your empathic Pisces nature absorbs environmental energies. Remember to cleanse your aura and set healthy boundaries."
-    ],
-    "love": [
-        "The stars suggest romance is in the air. Be open to unexpected connections and magical moments.",
-        "Venus is highlighting harmony in relationships. Express your feelings honestly and listen with an open heart.",
-        "The cosmos indicates a time for healing in relationships. Forgiveness and understanding will strengthen bonds.",
-        "Celestial alignments favor deepening intimacy. Share your authentic self with those you trust.",
-        "The planets support relationship growth. Small gestures of love will have meaningful impact now."
-    ],
-    "career": [
-        "The stars indicate professional advancement. Your efforts are being noticed by those in positions of influence.",
-        "Mercury supports clear communication at work. Express your ideas confidently in meetings and presentations.",
-        "Saturn rewards diligence and structure. Organizing your workflow will increase productivity and recognition.",
-        "Jupiter expands career opportunities. Be ready to say yes to projects that stretch your abilities.",
-        "Mars energizes your professional ambition. This is an excellent time to take initiative on important projects."
-    ],
-    "health": [
-        "The celestial bodies emphasize balance for wellbeing. Consider how to harmonize work, rest, and play in your routine.",
-        "The moon influences your emotional health. Nurturing activities like meditation or nature walks will restore inner peace.",
-        "Jupiter supports vitality and resilience. Physical activities that bring joy will be particularly beneficial now.",
-        "Neptune heightens intuition about wellness needs. Pay attention to what your body is communicating to you.",
-        "Venus encourages self-care rituals. Taking time for beauty and pleasure is not indulgence but necessary nourishment."
-    ]
+import calendar
+import hashlib
+import re
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Dict, List, NamedTuple, Optional
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.corpus import response_corpus
+from app.services.ephemeris import ZODIAC_SIGNS, sign_of
+
+# Topic keywords in priority order: the first topic wins ties
+TOPIC_KEYWORDS: Dict[str, List[str]] = {
+    "love": ["love", "relationship", "partner", "romance", "dating"],
+    "career": ["job", "career", "work", "profession", "business"],
+    "health": ["health", "wellness", "fitness", "body", "energy"],
 }
 
-def get_astro_response(query: str, user_name: str = "") -> str:
-    """Generate a mock astrological response based on user query"""
-    
-    # Check if query mentions specific zodiac sign
-    query_lower = query.lower()
-    for sign in ["aries", "taurus", "gemini", "cancer", "leo", "virgo", 
-                "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces"]:
-        if sign in query_lower:
-            return random.choice(MOCK_RESPONSES[sign])
-    
-    # Check for specific topics
-    if any(word in query_lower for word in ["love", "relationship", "partner", "romance", "dating"]):
-        return random.choice(MOCK_RESPONSES["love"])
-    
-    if any(word in query_lower for word in ["job", "career", "work", "profession", "business"]):
-        return random.choice(MOCK_RESPONSES["career"])
-    
-    if any(word in query_lower for word in ["health", "wellness", "fitness", "body", "energy"]):
-        return random.choice(MOCK_RESPONSES["health"])
-    
-    # Default to general response
-    response = random.choice(MOCK_RESPONSES["general"])
-    
-    # Personalize if user name is provided
-    if user_name:
+class Intent(NamedTuple):
+    sign: Optional[str]
+    topic: Optional[str]
+    confidence: float
+
+_WORD_PATTERN = re.compile(r"[a-z]+")
+
+def _build_vocabulary() -> Dict[str, str]:
+    """Map every sign and topic keyword (and its plural) to its category.
+
+    Queries are tokenised once and each word is a single dict lookup, so the
+    cost no longer grows with the number of vocabularies, and words must
+    match whole: "leo" no longer matches inside "leonard".
+    """
+    vocabulary = {sign: "sign" for sign in ZODIAC_SIGNS}
+    for topic, words in TOPIC_KEYWORDS.items():
+        for word in words:
+            vocabulary.setdefault(word, topic)
+    for word, category in list(vocabulary.items()):
+        vocabulary.setdefault(word + "s", category)
+    return vocabulary
+
+_VOCABULARY = _build_vocabulary()
+
+def classify_intent(query: str) -> Intent:
+    """Classify a query into a zodiac sign and topic in a single scan.
+
+    The first sign mentioned wins. The topic is the one with the most keyword
+    hits, ties going to the earlier topic in ``TOPIC_KEYWORDS``. Confidence is
+    the share of all matched words that support the chosen sign/topic.
+    """
+    sign: Optional[str] = None
+    topic_hits = dict.fromkeys(TOPIC_KEYWORDS, 0)
+    sign_hits = 0
+    total = 0
+
+    lookup = _VOCABULARY.get
+    for word in _WORD_PATTERN.findall(query.lower()):
+        category = lookup(word)
+        if category is None:
+            continue
+        total += 1
+        if category == "sign":
+            if word not in ZODIAC_SIGNS:
+                word = word[:-1]
+            if sign is None:
+                sign = word
+            if word == sign:
+                sign_hits += 1
+        else:
+            topic_hits[category] += 1
+
+    if total == 0:
+        return Intent(sign=None, topic=None, confidence=0.0)
+
+    topic = max(topic_hits, key=topic_hits.get)
+    if topic_hits[topic] == 0:
+        topic = None
+
+    supporting = sign_hits + (topic_hits[topic] if topic else 0)
+    return Intent(sign=sign, topic=topic, confidence=round(supporting / total, 3))
+
+def _pick(category: str, *seed: object) -> str:
+    """Choose a response from a category, stable for the given seed."""
+    digest = hashlib.sha256(":".join(map(str, (category,) + seed)).encode()).digest()
+    # One snapshot for both the size and the entry, so a reload in between can't mismatch them
+    return response_corpus.pick(category, int.from_bytes(digest[:8], "big"))
+
+def _end_of_day(day: date) -> float:
+    """Unix time of the UTC midnight that ends ``day``."""
+    return calendar.timegm((day + timedelta(days=1)).timetuple())
+
+def _compose_reading(sign: Optional[str], topic: Optional[str], day: date) -> str:
+    parts = []
+    if sign:
+        parts.append(_pick(sign, day))
+    if topic:
+        parts.append(_pick(topic, sign, day))
+    if not parts:
+        parts.append(_pick("general", day))
+    return " ".join(parts)
+
+# Daily readings only vary by (sign, topic, date), so a day's worth of keys
+# (13 x 4) fits comfortably and nearly every message is served from memory.
+daily_reading_cache = TTLCache(maxsize=settings.READING_CACHE_MAXSIZE, ttl=24 * 60 * 60)
+
+def get_daily_reading(sign: Optional[str], topic: Optional[str], day: Optional[date] = None) -> str:
+    """Deterministic reading for a sign/topic on a given (UTC) day, cached until midnight."""
+    day = day or datetime.utcnow().date()
+    # Keyed on the corpus version so a content reload isn't masked until midnight
+    return daily_reading_cache.get_or_set(
+        (sign, topic, day, response_corpus.version),
+        lambda: _compose_reading(sign, topic, day),
+        expires_at=_end_of_day(day),
+    )
+
+def get_personal_reading(user_id: int, user_name: str, day: date, sign: Optional[str] = None) -> str:
+    """A user's forecast for the day: a sign (or general) passage plus one per topic.
+
+    Pure and deterministic, so it can be precomputed in worker processes.
+    """
+    parts = [_pick(sign or "general", user_id, day)]
+    parts.extend(_pick(topic, user_id, day) for topic in TOPIC_KEYWORDS)
+    reading = " ".join(parts)
+    return f"{user_name}, {reading}" if user_name else reading
+
+def get_astro_response(
+    query: str,
+    user_name: str = "",
+    positions: Optional[Dict[str, float]] = None
+) -> str:
+    """Generate a mock astrological response based on user query.
+
+    ``positions`` maps body names to ecliptic longitudes (see
+    ``app.services.ephemeris``). When given, the Sun's sign stands in for a
+    sign the query didn't mention and the Moon's sign is noted.
+    """
+    intent = classify_intent(query)
+    sign = intent.sign
+    if sign is None and positions and "sun" in positions:
+        sign = sign_of(positions["sun"])
+
+    day = datetime.utcnow().date()
+    response = get_daily_reading(sign, intent.topic, day)
+
+    if sign:
+        if positions and "moon" in positions:
+            response += f" With the Moon in {sign_of(positions['moon']).capitalize()}, let your feelings guide the details."
+        return response
+
+    # Personalize general readings if user name is provided
+    if user_name and not intent.topic:
         personalized_intros = [
             f"{user_name}, {response}",
             f"Dear {user_name}, {response}",
@@ -149,6 +155,15 @@ def get_astro_response(query: str, user_name: str = "") -> str:
             f"{response} This is especially true for you, {user_name}.",
             f"{response} Remember this, {user_name}, as you navigate your path."
         ]
-        return random.choice(personalized_intros)
+        digest = hashlib.sha256(f"{user_name}:{day}".encode()).digest()
+        return personalized_intros[digest[0] % len(personalized_intros)]
     
-    return response
\ No newline at end of file
+    return response
+
+async def stream_astro_response(
+    query: str,
+    user_name: str = "",
+    positions: Optional[Dict[str, float]] = None
+) -> AsyncIterator[str]:
+    """Yield the response in chunks; the mock generator produces a single one."""
+    yield get_astro_response(query, user_name, positions)
\ No newline at end of file
@@ -1,59 +1,321 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
-from sqlalchemy import desc
+from sqlalchemy import delete, desc, func, insert, inspect, select, tuple_, update
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
+import base64
 
-from app.models.user import Chat, Message, User, SubscriptionTier
+from app.models.user import Chat, Message, MessageArchive, User
 from app.core.config import settings
+from app.services.archive import get_archived_messages
+from app.services.context import advance_context, make_turn
+from app.services.ingest import get_message_writer
+from app.services.usage import consume_quota
 
-def get_user_chats(db: Session, user_id: int) -> List[Chat]:
-    return db.query(Chat).filter(Chat.user_id == user_id).order_by(desc(Chat.updated_at)).all()
+async def get_user_chats(db: AsyncSession, user_id: int) -> List[Chat]:
+    result = await db.scalars(select(Chat).where(Chat.user_id == user_id).order_by(desc(Chat.updated_at)))
+    return result.all()
 
-def get_chat(db: Session, chat_id: int, user_id: int) -> Chat:
-    chat = db.query(Chat).filter(Chat.id == chat_id, Chat.user_id == user_id).first()
+async def get_user_chat_summaries(db: AsyncSession, user_id: int, skip: int = 0, limit: int = 50) -> list:
+    """A page of the user's chats with message counts and a last-message preview.
+
+    Everything comes from one statement: the page of chats is picked first,
+    then only those chats' messages and archive blocks are aggregated and
+    joined back.
+    """
+    activity = func.coalesce(Chat.updated_at, Chat.created_at)
+    page = select(
+        Chat.id, Chat.title, Chat.created_at, Chat.updated_at, activity.label("activity")
+    ).where(Chat.user_id == user_id).order_by(desc(activity), desc(Chat.id)).offset(skip).limit(limit).subquery()
+    
+    stats = select(
+        Message.chat_id.label("chat_id"),
+        func.count(Message.id).label("message_count"),
+        func.max(Message.id).label("last_message_id"),
+    ).where(Message.chat_id.in_(select(page.c.id))).group_by(Message.chat_id).subquery()
+    
+    # Archived messages count too; their text stays compressed, so a fully archived chat has no preview
+    archived = select(
+        MessageArchive.chat_id.label("chat_id"),
+        func.sum(MessageArchive.message_count).label("message_count"),
+        func.max(MessageArchive.last_created_at).label("last_created_at"),
+    ).where(MessageArchive.chat_id.in_(select(page.c.id))).group_by(MessageArchive.chat_id).subquery()
+    
+    last_message = aliased(Message)
+    result = await db.execute(select(
+        page.c.id,
+        page.c.title,
+        page.c.created_at,
+        page.c.updated_at,
+        (func.coalesce(stats.c.message_count, 0) + func.coalesce(archived.c.message_count, 0)).label("message_count"),
+        func.substr(last_message.content, 1, settings.CHAT_PREVIEW_LENGTH).label("last_message_preview"),
+        func.coalesce(last_message.created_at, archived.c.last_created_at).label("last_message_at"),
+    ).outerjoin(stats, stats.c.chat_id == page.c.id).outerjoin(
+        last_message, last_message.id == stats.c.last_message_id
+    ).outerjoin(archived, archived.c.chat_id == page.c.id).order_by(desc(page.c.activity), desc(page.c.id)))
+    return result.all()
+
+async def get_chat(db: AsyncSession, chat_id: int, user_id: int, with_messages: bool = False) -> Chat:
+    """The user's chat; ``with_messages`` loads the full history up front, as
+    relationships can't be lazy-loaded on an async session."""
+    query = select(Chat).where(Chat.id == chat_id, Chat.user_id == user_id)
+    if with_messages:
+        query = query.options(selectinload(Chat.messages))
+    chat = await db.scalar(query)
     if not chat:
         raise HTTPException(status_code=404, detail="Chat not found")
     return chat
 
-def create_chat(db: Session, user_id: int, title: Optional[str] = "New Chat") -> Chat:
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if user has reached chat limit for free tier
-    if user.subscription_tier == SubscriptionTier.FREE:
-        chat_count = db.query(Chat).filter(Chat.user_id == user_id).count()
-        if chat_count >= settings.MAX_FREE_CHATS:
-            raise HTTPException(status_code=402, detail="Free tier chat limit reached. Please upgrade to continue.")
+async def get_chat_with_messages(db: AsyncSession, chat_id: int, user_id: int) -> Chat:
+    """The chat and its full history, including archived messages and those
+    still waiting in the write-behind buffer."""
+    chat = await get_chat(db, chat_id=chat_id, user_id=user_id, with_messages=True)
+    archived = await get_archived_messages(db, chat_id)
+    writer = get_message_writer()
+    pending = writer.pending(chat_id) if writer else []
+    if archived or pending:
+        # Detached, so the unsaved messages can't be flushed through the collection
+        db.expunge(chat)
+        set_committed_value(chat, "messages", archived + list(chat.messages) + pending)
+    return chat
+
+async def create_chat(db: AsyncSession, user: User, title: Optional[str] = "New Chat") -> Chat:
+    # The quota increment and the insert commit together, so a failed insert isn't charged
+    await consume_quota(db, user, "chats", commit=False)
     
-    db_chat = Chat(user_id=user_id, title=title)
+    # A new chat has no messages; setting the collection avoids a load on serialization
+    db_chat = Chat(user_id=user.id, title=title, messages=[])
     db.add(db_chat)
-    db.commit()
-    db.refresh(db_chat)
+    await db.commit()
     return db_chat
 
-def add_message(db: Session, chat_id: int, user_id: int, content: str, is_user: bool = True) -> Message:
-    chat = get_chat(db, chat_id=chat_id, user_id=user_id)
+async def _check_chat(db: AsyncSession, chat_id: int, user_id: int) -> None:
+    """Ownership check without writing; the write-behind flush bumps ``updated_at``."""
+    if await db.scalar(select(Chat.id).where(Chat.id == chat_id, Chat.user_id == user_id)) is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+
+async def _touch_chat(db: AsyncSession, chat_id: int, user_id: int):
+    """Verify ownership and bump ``updated_at`` in a single UPDATE ... RETURNING.
+
+    Returns the chat's context columns, read under the row lock the UPDATE takes.
+    """
+    touched = (await db.execute(
+        update(Chat)
+        .where(Chat.id == chat_id, Chat.user_id == user_id)
+        .values(updated_at=func.now())
+        .returning(Chat.context_summary, Chat.context_turns)
+    )).first()
+    if touched is None:
+        await db.rollback()
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return touched
+
+async def _advance_chat_context(db: AsyncSession, chat_id: int, touched, new_turns: List[dict]) -> None:
+    values = await advance_context(db, chat_id, touched.context_summary, touched.context_turns, new_turns)
+    await db.execute(update(Chat).where(Chat.id == chat_id).values(**values))
+
+async def get_chat_context(db: AsyncSession, chat_id: int, user_id: int) -> dict:
+    """Conversation context for the next prompt of a chat: ``{"summary", "turns"}``.
+
+    Reads one chat row however long the chat is (see ``app.services.context``),
+    plus any messages still queued for write-behind. Raises 404 unless the
+    chat is the user's; reply routes call it first so nothing is charged or
+    generated for someone else's chat.
+    """
+    row = (await db.execute(
+        select(Chat.context_summary, Chat.context_turns).where(Chat.id == chat_id, Chat.user_id == user_id)
+    )).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
     
-    db_message = Message(chat_id=chat_id, content=content, is_user=is_user)
-    db.add(db_message)
+    pending = []
+    writer = get_message_writer()
+    if writer:
+        pending = [make_turn(message.is_user, message.content) for message in writer.pending(chat_id)]
+    values = await advance_context(db, chat_id, row.context_summary, row.context_turns, pending)
+    return {"summary": values["context_summary"], "turns": values["context_turns"]}
+
+async def add_message(db: AsyncSession, chat_id: int, user_id: int, content: str, is_user: bool = True) -> Message:
+    writer = get_message_writer()
+    if writer:
+        await _check_chat(db, chat_id=chat_id, user_id=user_id)
+        (message,) = await writer.submit(db, [
+            {"chat_id": chat_id, "content": content, "is_user": is_user, "created_at": datetime.utcnow()}
+        ])
+        return message
     
-    # Update chat's updated_at timestamp
-    chat.updated_at = db.func.now()
+    touched = await _touch_chat(db, chat_id=chat_id, user_id=user_id)
+    await _advance_chat_context(db, chat_id, touched, [make_turn(is_user, content)])
     
-    db.commit()
-    db.refresh(db_message)
+    db_message = Message(chat_id=chat_id, content=content, is_user=is_user)
+    db.add(db_message)
+    await db.commit()
     return db_message
 
-def update_chat_title(db: Session, chat_id: int, user_id: int, title: str) -> Chat:
-    chat = get_chat(db, chat_id=chat_id, user_id=user_id)
+async def add_message_pair(db: AsyncSession, chat_id: int, user_id: int, user_content: str, ai_content: str) -> Tuple[Message, Message]:
+    """Store a user message and its reply in one transaction.
+
+    One commit: the ownership-checking UPDATE of the chat, an UPDATE of its
+    rolling context and a two-row INSERT ... RETURNING of the messages. In write-behind
+    mode the pair is queued instead and written with other chats' messages.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"chat_id": chat_id, "content": user_content, "is_user": True, "created_at": now},
+        {"chat_id": chat_id, "content": ai_content, "is_user": False, "created_at": now},
+    ]
+    writer = get_message_writer()
+    if writer:
+        await _check_chat(db, chat_id=chat_id, user_id=user_id)
+        user_message, ai_message = await writer.submit(db, rows)
+        return user_message, ai_message
+    
+    touched = await _touch_chat(db, chat_id=chat_id, user_id=user_id)
+    await _advance_chat_context(db, chat_id, touched, [make_turn(row["is_user"], row["content"]) for row in rows])
+    messages = (await db.scalars(
+        insert(Message).returning(Message, sort_by_parameter_order=True), rows
+    )).all()
+    await db.commit()
+    return messages[0], messages[1]
+
+async def update_chat_title(db: AsyncSession, chat_id: int, user_id: int, title: str) -> Chat:
+    chat = await get_chat(db, chat_id=chat_id, user_id=user_id)
     chat.title = title
-    db.commit()
-    db.refresh(chat)
-    return chat
+    await db.commit()
+    return await get_chat_with_messages(db, chat_id=chat_id, user_id=user_id)
+
+_children_cascade: Optional[bool] = None
+
+def _cascades_from_chats(connection) -> bool:
+    inspector = inspect(connection)
+    return all(
+        any(
+            key["referred_table"] == Chat.__tablename__
+            and (key["options"].get("ondelete") or "").upper() == "CASCADE"
+            for key in inspector.get_foreign_keys(table)
+        )
+        for table in (Message.__tablename__, MessageArchive.__tablename__)
+    )
+
+async def _chat_children_cascade(db: AsyncSession) -> bool:
+    """Whether the database deletes a chat's messages and archive blocks with it.
 
-def delete_chat(db: Session, chat_id: int, user_id: int) -> None:
-    chat = get_chat(db, chat_id=chat_id, user_id=user_id)
-    db.delete(chat)
-    db.commit()
-    return None
\ No newline at end of file
+    create_all doesn't alter existing tables, so databases created before the
+    foreign keys gained ON DELETE CASCADE still reject deleting a chat that
+    has messages. Checked once per process.
+    """
+    global _children_cascade
+    if _children_cascade is None:
+        _children_cascade = await (await db.connection()).run_sync(_cascades_from_chats)
+    return _children_cascade
+
+async def delete_chats(db: AsyncSession, user_id: int, chat_ids: Optional[List[int]] = None) -> List[int]:
+    """Delete the given chats of the user, or all of them, and return the ids deleted.
+
+    One set-based DELETE ... RETURNING; messages and archive blocks go with
+    their chats through ON DELETE CASCADE, without being loaded. On databases
+    whose foreign keys predate the cascade, the children are deleted first
+    with set-based statements in the same transaction.
+    """
+    owned = [Chat.user_id == user_id]
+    if chat_ids is not None:
+        owned.append(Chat.id.in_(chat_ids))
+    if not await _chat_children_cascade(db):
+        chats = select(Chat.id).where(*owned)
+        for model in (Message, MessageArchive):
+            await db.execute(
+                delete(model).where(model.chat_id.in_(chats)).execution_options(synchronize_session=False)
+            )
+    deleted = (await db.scalars(
+        delete(Chat).where(*owned).returning(Chat.id).execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    
+    writer = get_message_writer()
+    if writer:
+        writer.discard(deleted)
+    return list(deleted)
+
+async def delete_chat(db: AsyncSession, chat_id: int, user_id: int) -> None:
+    if not await delete_chats(db, user_id=user_id, chat_ids=[chat_id]):
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return None
+
+def encode_cursor(message: Message) -> str:
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _message_key(message: Message) -> Tuple[datetime, int]:
+    return message.created_at, message.id
+
+async def get_chat_messages(
+    db: AsyncSession,
+    chat_id: int,
+    user_id: int,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: int = 50
+) -> dict:
+    """One page of a chat's messages in chronological order.
+
+    Without a cursor the newest page is returned. ``before``/``after`` are
+    cursors from a previous page; each page is a single range scan on
+    (chat_id, created_at, id), so its cost doesn't grow with chat length.
+    Archived blocks are only decoded once a page reaches past the hot rows.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    await get_chat(db, chat_id=chat_id, user_id=user_id)
+    
+    key = tuple_(Message.created_at, Message.id)
+    query = select(Message).where(Message.chat_id == chat_id)
+    if after:
+        bound = decode_cursor(after)
+        query = query.where(key > bound).order_by(Message.created_at, Message.id)
+    else:
+        bound = decode_cursor(before) if before else None
+        if bound:
+            query = query.where(key < bound)
+        query = query.order_by(desc(Message.created_at), desc(Message.id))
+    
+    messages = list((await db.scalars(query.limit(limit + 1))).all())
+    
+    # Scrolling back past the hot table continues into the chat's archive, and
+    # messages still waiting in the write-behind buffer are merged in (read-your-writes)
+    extra = []
+    if after or len(messages) <= limit:
+        extra.extend(await get_archived_messages(
+            db, chat_id, before=None if after else bound, after=bound if after else None, limit=limit + 1
+        ))
+    writer = get_message_writer()
+    if writer:
+        extra.extend(writer.pending(chat_id))
+    if after:
+        extra = [m for m in extra if _message_key(m) > bound]
+    elif bound:
+        extra = [m for m in extra if _message_key(m) < bound]
+    if extra:
+        seen = {m.id for m in messages}
+        messages.extend(m for m in extra if m.id not in seen)
+        messages.sort(key=_message_key, reverse=not after)
+    
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    if not after:
+        messages.reverse()
+    
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "before_cursor": encode_cursor(messages[0]) if messages else before,
+        "after_cursor": encode_cursor(messages[-1]) if messages else after,
+    }
\ No newline at end of file
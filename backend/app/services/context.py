@@ -0,0 +1,77 @@
+"""
+Rolling conversation context for response generation.
+
+Each chat keeps its latest turns verbatim in ``chats.context_turns`` (at most
+``CHAT_CONTEXT_TURNS`` of them and ``CHAT_CONTEXT_WINDOW_CHARS`` of text) and
+everything older as a running summary in ``chats.context_summary``. Both are
+advanced in the transaction that stores new messages: turns pushed out of the
+window are folded into the summary as one short line each, and the oldest
+lines are dropped once the summary passes ``CHAT_CONTEXT_SUMMARY_CHARS``.
+Preparing a prompt reads one chat row, however long the conversation is.
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.user import Message
+
+# {"role": "user" | "assistant", "content": ...}
+Turn = Dict[str, str]
+
+SUMMARY_LINE_LENGTH = 160
+
+def make_turn(is_user: bool, content: Optional[str]) -> Turn:
+    return {"role": "user" if is_user else "assistant", "content": content or ""}
+
+def _summary_line(turn: Turn) -> str:
+    text = " ".join(turn["content"].split())
+    if len(text) > SUMMARY_LINE_LENGTH:
+        text = text[:SUMMARY_LINE_LENGTH - 1].rstrip() + "…"
+    return f"{'User' if turn['role'] == 'user' else 'Assistant'}: {text}"
+
+def fold_turns(summary: Optional[str], turns: List[Turn], new_turns: Iterable[Turn]) -> Tuple[str, List[Turn]]:
+    """Append ``new_turns`` to the window, moving whatever no longer fits into the summary."""
+    turns = list(turns) + list(new_turns)
+    lines = summary.splitlines() if summary else []
+    size = sum(len(turn["content"]) for turn in turns)
+    while turns and (len(turns) > settings.CHAT_CONTEXT_TURNS or size > settings.CHAT_CONTEXT_WINDOW_CHARS):
+        oldest = turns.pop(0)
+        size -= len(oldest["content"])
+        lines.append(_summary_line(oldest))
+
+    length = sum(len(line) + 1 for line in lines)
+    start = 0
+    while length > settings.CHAT_CONTEXT_SUMMARY_CHARS and start < len(lines):
+        length -= len(lines[start]) + 1
+        start += 1
+    return "\n".join(lines[start:]), turns
+
+async def recent_turns(db: AsyncSession, chat_id: int) -> List[Turn]:
+    """Seed a window from stored messages, for chats that predate rolling context."""
+    rows = (await db.execute(
+        select(Message.is_user, Message.content)
+        .where(Message.chat_id == chat_id)
+        .order_by(Message.created_at.desc(), Message.id.desc())
+        .limit(settings.CHAT_CONTEXT_TURNS)
+    )).all()
+    return fold_turns(None, [], [make_turn(is_user, content) for is_user, content in reversed(rows)])[1]
+
+async def advance_context(
+    db: AsyncSession,
+    chat_id: int,
+    summary: Optional[str],
+    turns: Optional[List[Turn]],
+    new_turns: Iterable[Turn]
+) -> Dict[str, object]:
+    """The chat's context columns after adding ``new_turns``, ready for an UPDATE.
+
+    ``summary``/``turns`` are the current values, read under the caller's
+    row lock on the chat.
+    """
+    if turns is None:
+        turns = await recent_turns(db, chat_id)
+    summary, turns = fold_turns(summary, turns, new_turns)
+    return {"context_summary": summary, "context_turns": turns}
@@ -0,0 +1,179 @@
+"""
+Packed, memory-mapped store for canned response templates.
+
+The content team edits ``app/data/responses.json`` (category -> list of
+templates). It is compiled into a packed binary file that every worker maps
+read-only, so the text lives once in the OS page cache rather than once per
+process as Python strings. Categories are indexed on first use and entries
+are decoded one at a time. When the JSON source or the packed file changes,
+workers pick it up within ``RESPONSE_CORPUS_RELOAD_INTERVAL`` seconds.
+
+Layout (little-endian)::
+
+    magic "ASTROCRP" | version u16 | category count u16
+    per category: name length u16 | name utf-8 | entry count u32 | offsets position u64
+    per category: (count + 1) u64 absolute offsets, then the utf-8 entries
+
+Rebuild by hand with ``python -m app.services.corpus``.
+"""
+
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+
+MAGIC = b"ASTROCRP"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sHH")
+_NAME_LEN = struct.Struct("<H")
+_CATEGORY = struct.Struct("<IQ")
+_OFFSET = struct.Struct("<Q")
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+def build_corpus(source: Path, target: Path) -> None:
+    """Compile the JSON source into the packed format, replacing ``target`` atomically."""
+    with open(source, encoding="utf-8") as f:
+        categories: Dict[str, List[str]] = json.load(f)
+
+    names = [name.encode("utf-8") for name in categories]
+    position = _HEADER.size + sum(_NAME_LEN.size + len(n) + _CATEGORY.size for n in names)
+
+    directory = [_HEADER.pack(MAGIC, FORMAT_VERSION, len(names))]
+    sections = []
+    for name, entries in zip(names, categories.values()):
+        encoded = [entry.encode("utf-8") for entry in entries]
+        directory.append(_NAME_LEN.pack(len(name)) + name + _CATEGORY.pack(len(encoded), position))
+
+        data_start = position + _OFFSET.size * (len(encoded) + 1)
+        offsets = [data_start]
+        for entry in encoded:
+            offsets.append(offsets[-1] + len(entry))
+        sections.append(b"".join(_OFFSET.pack(o) for o in offsets) + b"".join(encoded))
+        position = offsets[-1]
+
+    tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(b"".join(directory))
+        f.write(b"".join(sections))
+    # Readers that still map the old file keep a valid view until they reopen
+    os.replace(tmp_path, target)
+
+class ResponseCorpus:
+    def __init__(self, path: Path, source: Optional[Path] = None, reload_interval: float = 5.0):
+        self.path = path
+        self.source = source
+        self.reload_interval = reload_interval
+        self.version = 0
+        self._lock = threading.Lock()
+        # (map, category directory, per-category offsets), swapped as one on reload
+        self._state: Optional[Tuple[mmap.mmap, Dict[str, Tuple[int, int]], Dict[str, Tuple[int, ...]]]] = None
+        self._file_id: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+
+    def _stale(self) -> bool:
+        if not self.path.exists():
+            return True
+        return self.source is not None and self.source.stat().st_mtime_ns > self.path.stat().st_mtime_ns
+
+    def _open(self) -> None:
+        if self.source is not None and self._stale():
+            build_corpus(self.source, self.path)
+
+        with open(self.path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = _HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            mapped.close()
+            raise ValueError(f"{self.path} is not a version {FORMAT_VERSION} response corpus")
+
+        directory = {}
+        position = _HEADER.size
+        for _ in range(count):
+            (name_len,) = _NAME_LEN.unpack_from(mapped, position)
+            position += _NAME_LEN.size
+            name = mapped[position:position + name_len].decode("utf-8")
+            position += name_len
+            directory[name] = _CATEGORY.unpack_from(mapped, position)
+            position += _CATEGORY.size
+
+        # The previous map is not closed explicitly: concurrent readers may still
+        # hold it, and it is unmapped once the last reference goes away
+        self._state = (mapped, directory, {})
+        self._file_id = (stat.st_ino, stat.st_mtime_ns)
+        self.version += 1
+
+    def _changed_on_disk(self) -> bool:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return True
+        return (stat.st_ino, stat.st_mtime_ns) != self._file_id or self._stale()
+
+    def _ensure_current(self) -> None:
+        now = time.monotonic()
+        if self._state is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if self._state is None or self._changed_on_disk():
+                self._open()
+            self._checked_at = now
+
+    def reload(self) -> None:
+        """Re-read the corpus now instead of waiting for the next change check."""
+        with self._lock:
+            self._open()
+            self._checked_at = time.monotonic()
+
+    def _category(self, category: str) -> Tuple[mmap.mmap, Tuple[int, ...]]:
+        """The current map and a category's offsets, indexing the category on first use."""
+        self._ensure_current()
+        mapped, directory, cache = self._state
+        offsets = cache.get(category)
+        if offsets is None:
+            count, position = directory[category]
+            offsets = struct.unpack_from(f"<{count + 1}Q", mapped, position)
+            cache[category] = offsets
+        return mapped, offsets
+
+    def categories(self) -> List[str]:
+        self._ensure_current()
+        return list(self._state[1])
+
+    def count(self, category: str) -> int:
+        return len(self._category(category)[1]) - 1
+
+    def entry(self, category: str, index: int) -> str:
+        mapped, offsets = self._category(category)
+        return mapped[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    def pick(self, category: str, n: int) -> str:
+        """Entry ``n`` modulo the category size, counted and read from one snapshot."""
+        mapped, offsets = self._category(category)
+        index = n % (len(offsets) - 1)
+        return mapped[offsets[index]:offsets[index + 1]].decode("utf-8")
+
+    def entries(self, category: str) -> List[str]:
+        mapped, offsets = self._category(category)
+        return [mapped[start:end].decode("utf-8") for start, end in zip(offsets, offsets[1:])]
+
+response_corpus = ResponseCorpus(
+    Path(settings.RESPONSE_CORPUS_PATH) if settings.RESPONSE_CORPUS_PATH else DATA_DIR / "responses.bin",
+    source=DATA_DIR / "responses.json",
+    reload_interval=settings.RESPONSE_CORPUS_RELOAD_INTERVAL,
+)
+
+if __name__ == "__main__":
+    build_corpus(response_corpus.source, response_corpus.path)
+    response_corpus.reload()
+    for name in response_corpus.categories():
+        print(f"{name}: {response_corpus.count(name)} entries")
@@ -0,0 +1,175 @@
+"""
+Vectorized low-precision ephemeris.
+
+Computes geocentric ecliptic longitudes (tropical, mean equinox of date) for
+the Sun, Moon and planets over arrays of timestamps in one NumPy pass. The
+planets use the JPL "Approximate Positions of the Planets" Keplerian elements
+(valid 1800-2050, errors well under a degree), and the Moon uses the largest
+terms of the Meeus lunar series. Nothing is downloaded: the whole model is the
+tables below, which is plenty for assigning zodiac signs.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Sequence, Union
+
+import numpy as np
+
+ZODIAC_SIGNS = (
+    "aries", "taurus", "gemini", "cancer", "leo", "virgo",
+    "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces",
+)
+
+BODIES = (
+    "sun", "moon", "mercury", "venus", "mars",
+    "jupiter", "saturn", "uranus", "neptune", "pluto",
+)
+
+_J2000 = 2451545.0
+_UNIX_EPOCH_JD = 2440587.5
+
+# General precession in longitude, degrees per Julian century
+_PRECESSION_RATE = 1.396971
+
+# a [au], e, I, L, longitude of perihelion, longitude of ascending node [deg],
+# each followed by its rate per Julian century (JPL Table 1, 1800-2050)
+_ELEMENTS = {
+    "mercury": ((0.38709927, 0.20563593, 7.00497902, 252.25032350, 77.45779628, 48.33076593),
+                (0.00000037, 0.00001906, -0.00594749, 149472.67411175, 0.16047689, -0.12534081)),
+    "venus": ((0.72333566, 0.00677672, 3.39467605, 181.97909950, 131.60246718, 76.67984255),
+              (0.00000390, -0.00004107, -0.00078890, 58517.81538729, 0.00268329, -0.27769418)),
+    "earth": ((1.00000261, 0.01671123, -0.00001531, 100.46457166, 102.93768193, 0.0),
+              (0.00000562, -0.00004392, -0.01294668, 35999.37244981, 0.32327364, 0.0)),
+    "mars": ((1.52371034, 0.09339410, 1.84969142, -4.55343205, -23.94362959, 49.55953891),
+             (0.00001847, 0.00007882, -0.00813131, 19140.30268499, 0.44441088, -0.29257343)),
+    "jupiter": ((5.20288700, 0.04838624, 1.30439695, 34.39644051, 14.72847983, 100.47390909),
+                (-0.00011607, -0.00013253, -0.00183714, 3034.74612775, 0.21252668, 0.20469106)),
+    "saturn": ((9.53667594, 0.05386179, 2.48599187, 49.95424423, 92.59887831, 113.66242448),
+               (-0.00125060, -0.00050991, 0.00193609, 1222.49362201, -0.41897216, -0.28867794)),
+    "uranus": ((19.18916464, 0.04725744, 0.77263783, 313.23810451, 170.95427630, 74.01692503),
+               (-0.00196176, -0.00004397, -0.00242939, 428.48202785, 0.40805281, 0.04240589)),
+    "neptune": ((30.06992276, 0.00859048, 1.77004347, -55.12002969, 44.96476227, 131.78422574),
+                (0.00026291, 0.00005105, 0.00035372, 218.45945325, -0.32241464, -0.01183482)),
+    "pluto": ((39.48211675, 0.24882730, 17.14001206, 238.92903833, 224.06891629, 110.30393684),
+              (-0.00031596, 0.00005170, 0.00004818, 145.20780515, -0.04062942, -0.01183482)),
+}
+
+# Moon: (coefficient [deg], multiples of D, M, M', F) for the main longitude terms
+_MOON_TERMS = np.array([
+    (6.288774, 0, 0, 1, 0),
+    (1.274027, 2, 0, -1, 0),
+    (0.658314, 2, 0, 0, 0),
+    (0.213618, 0, 0, 2, 0),
+    (-0.185116, 0, 1, 0, 0),
+    (-0.114332, 0, 0, 0, 2),
+    (0.058793, 2, 0, -2, 0),
+    (0.057066, 2, -1, -1, 0),
+    (0.053322, 2, 0, 1, 0),
+    (0.045758, 2, -1, 0, 0),
+    (-0.040923, 0, 1, -1, 0),
+    (-0.034720, 1, 0, 0, 0),
+    (-0.030383, 0, 1, 1, 0),
+    (0.015327, 2, 0, 0, -2),
+    (0.010980, 0, 0, 1, -2),
+    (0.010675, 4, 0, -1, 0),
+    (0.010034, 0, 0, 3, 0),
+    (0.008548, 4, 0, -2, 0),
+])
+
+Timestamps = Union[np.ndarray, Sequence[datetime], Iterable[datetime]]
+
+def julian_day(timestamps: Timestamps) -> np.ndarray:
+    """Convert datetimes (naive ones are taken as UTC) or ``datetime64`` to Julian days."""
+    if not isinstance(timestamps, np.ndarray):
+        timestamps = [
+            t.astimezone(timezone.utc).replace(tzinfo=None) if getattr(t, "tzinfo", None) else t
+            for t in timestamps
+        ]
+    seconds = np.asarray(timestamps, dtype="datetime64[s]").astype(np.int64)
+    return seconds / 86400.0 + _UNIX_EPOCH_JD
+
+def _centuries(jd: np.ndarray) -> np.ndarray:
+    return (jd - _J2000) / 36525.0
+
+def _solve_kepler(mean_anomaly: np.ndarray, e: np.ndarray, iterations: int = 6) -> np.ndarray:
+    """Eccentric anomaly by a fixed number of Newton steps (radians)."""
+    E = mean_anomaly + e * np.sin(mean_anomaly)
+    for _ in range(iterations):
+        E = E - (E - e * np.sin(E) - mean_anomaly) / (1.0 - e * np.cos(E))
+    return E
+
+def _heliocentric(body: str, T: np.ndarray) -> np.ndarray:
+    """Heliocentric J2000 ecliptic x, y (au) for a body, shape ``(2, n)``."""
+    base, rate = _ELEMENTS[body]
+    a, e, inc, L, peri, node = (b + r * T for b, r in zip(base, rate))
+    arg_peri = np.radians(peri - node)
+    M = np.radians(np.mod(L - peri, 360.0))
+    inc, node = np.radians(inc), np.radians(node)
+
+    E = _solve_kepler(M, e)
+    xp = a * (np.cos(E) - e)
+    yp = a * np.sqrt(1.0 - e * e) * np.sin(E)
+
+    cw, sw = np.cos(arg_peri), np.sin(arg_peri)
+    cn, sn = np.cos(node), np.sin(node)
+    ci = np.cos(inc)
+    x = (cw * cn - sw * sn * ci) * xp + (-sw * cn - cw * sn * ci) * yp
+    y = (cw * sn + sw * cn * ci) * xp + (-sw * sn + cw * cn * ci) * yp
+    return np.stack((x, y))
+
+def _moon_longitude(T: np.ndarray) -> np.ndarray:
+    """Geocentric lunar longitude of date (degrees), ~0.1 degree accuracy."""
+    mean_longitude = 218.3164477 + 481267.88123421 * T
+    args = np.radians(np.stack((
+        297.8501921 + 445267.1114034 * T,   # D, mean elongation
+        357.5291092 + 35999.0502909 * T,    # M, solar anomaly
+        134.9633964 + 477198.8675055 * T,   # M', lunar anomaly
+        93.2720950 + 483202.0175233 * T,    # F, argument of latitude
+    )))
+    phases = _MOON_TERMS[:, 1:] @ args
+    return mean_longitude + _MOON_TERMS[:, 0] @ np.sin(phases)
+
+def ecliptic_longitudes(timestamps: Timestamps) -> Dict[str, np.ndarray]:
+    """Geocentric ecliptic longitudes in degrees ``[0, 360)`` for every body.
+
+    Returns one array per name in ``BODIES``, each aligned with ``timestamps``.
+    """
+    T = _centuries(julian_day(timestamps))
+    precession = _PRECESSION_RATE * T
+    earth = _heliocentric("earth", T)
+
+    longitudes = {
+        "sun": np.degrees(np.arctan2(-earth[1], -earth[0])) + precession,
+        "moon": _moon_longitude(T),
+    }
+    for body in BODIES[2:]:
+        geo = _heliocentric(body, T) - earth
+        longitudes[body] = np.degrees(np.arctan2(geo[1], geo[0])) + precession
+
+    return {body: np.mod(longitudes[body], 360.0) for body in BODIES}
+
+def ascendant(timestamps: Timestamps, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """Ecliptic longitude of the ascendant (degrees) for observers at the given
+    geographic latitude/longitude (degrees, east positive)."""
+    jd = julian_day(timestamps)
+    T = _centuries(jd)
+    gmst = 280.46061837 + 360.98564736629 * (jd - _J2000) + 0.000387933 * T * T
+    ramc = np.radians(gmst + np.asarray(longitude, dtype=float))
+    obliquity = np.radians(23.439291 - 0.0130042 * T)
+    phi = np.radians(np.asarray(latitude, dtype=float))
+    asc = np.arctan2(
+        np.cos(ramc),
+        -(np.sin(ramc) * np.cos(obliquity) + np.tan(phi) * np.sin(obliquity)),
+    )
+    return np.mod(np.degrees(asc), 360.0)
+
+def sign_index(longitudes: np.ndarray) -> np.ndarray:
+    """Zodiac sign index (0 = Aries) for each longitude."""
+    return (np.mod(longitudes, 360.0) // 30.0).astype(np.int8)
+
+def sign_of(longitude: float) -> str:
+    """Zodiac sign name for a single longitude in degrees."""
+    return ZODIAC_SIGNS[int(longitude % 360.0 // 30.0)]
+
+def positions_at(moment: datetime) -> Dict[str, float]:
+    """Longitudes for a single moment, as plain floats."""
+    return {body: float(values[0]) for body, values in ecliptic_longitudes([moment]).items()}
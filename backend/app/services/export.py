@@ -0,0 +1,150 @@
+"""
+Streaming export of a user's chats and messages.
+
+One server-side cursor (``yield_per``) walks the user's chats joined to their
+messages in chat order; archived blocks of a chat are decoded just before
+its hot messages, so every chat comes out oldest message first. Output is
+encoded and, optionally, gzip-compressed incrementally and handed out in
+chunks of about ``CHUNK_SIZE`` bytes, so memory use doesn't grow with the
+amount of history. Messages still queued for write-behind are not included.
+
+NDJSON has one ``{"type": "chat"}`` line per chat followed by its
+``{"type": "message"}`` lines. CSV has one row per message, with the chat's
+id and title repeated. Text cells that a spreadsheet would read as a formula
+get a leading ``'``; NDJSON keeps the text as written.
+"""
+
+import csv
+import enum
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base import AsyncSessionLocal
+from app.models.user import Chat, Message, MessageArchive
+from app.services.archive import ArchivedRow, decompress, unpack_messages
+
+CHUNK_SIZE = 64 * 1024
+YIELD_PER = 1000
+# Archive blocks hold up to MESSAGE_ARCHIVE_BLOCK_SIZE messages each
+BLOCK_YIELD_PER = 4
+
+CSV_COLUMNS = ("chat_id", "chat_title", "message_id", "created_at", "is_user", "content")
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+MEDIA_TYPES = {ExportFormat.NDJSON: "application/x-ndjson", ExportFormat.CSV: "text/csv"}
+
+# (chat id, title, created_at), then the chat's messages as ArchivedRow tuples
+ExportItem = Tuple[Tuple[int, str, datetime], Optional[ArchivedRow]]
+
+async def _archived_rows(db: AsyncSession, chat_id: int) -> AsyncIterator[ArchivedRow]:
+    blocks = await db.stream(
+        select(MessageArchive.codec, MessageArchive.data)
+        .where(MessageArchive.chat_id == chat_id)
+        .order_by(MessageArchive.first_created_at, MessageArchive.first_message_id)
+        .execution_options(yield_per=BLOCK_YIELD_PER)
+    )
+    async for codec, data in blocks:
+        for row in unpack_messages(decompress(codec, data)):
+            yield row
+
+async def _export_items(db: AsyncSession, user_id: int) -> AsyncIterator[ExportItem]:
+    """Each chat as ``(chat, None)``, followed by ``(chat, message)`` for its messages in order."""
+    archived = set((await db.scalars(
+        select(MessageArchive.chat_id).join(Chat, Chat.id == MessageArchive.chat_id)
+        .where(Chat.user_id == user_id).distinct()
+    )).all())
+    rows = await db.stream(
+        select(
+            Chat.id, Chat.title, Chat.created_at,
+            Message.id, Message.created_at, Message.is_user, Message.content,
+        )
+        .outerjoin(Message, Message.chat_id == Chat.id)
+        .where(Chat.user_id == user_id)
+        .order_by(Chat.id, Message.created_at, Message.id)
+        .execution_options(yield_per=YIELD_PER)
+    )
+    chat = None
+    async for chat_id, title, chat_created_at, message_id, created_at, is_user, content in rows:
+        if chat is None or chat[0] != chat_id:
+            chat = (chat_id, title, chat_created_at)
+            yield chat, None
+            if chat_id in archived:
+                async for message in _archived_rows(db, chat_id):
+                    yield chat, message
+        if message_id is not None:
+            yield chat, (message_id, created_at, is_user, content)
+
+def _timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+# Leading characters that make Excel and friends evaluate a cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def _csv_text(value: Optional[str]) -> Optional[str]:
+    """``value`` made safe to open in a spreadsheet (no formula injection)."""
+    if value and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+def _ndjson_line(item: ExportItem) -> str:
+    (chat_id, title, chat_created_at), message = item
+    if message is None:
+        record = {"type": "chat", "id": chat_id, "title": title, "created_at": _timestamp(chat_created_at)}
+    else:
+        message_id, created_at, is_user, content = message
+        record = {
+            "type": "message",
+            "chat_id": chat_id,
+            "id": message_id,
+            "is_user": is_user,
+            "created_at": _timestamp(created_at),
+            "content": content,
+        }
+    return json.dumps(record, ensure_ascii=False) + "\n"
+
+async def export_chats(user_id: int, format: ExportFormat, compress: bool = False) -> AsyncIterator[bytes]:
+    """Yield the user's export as encoded chunks, for a ``StreamingResponse``.
+
+    Opens its own session: the body is produced after the request's
+    dependencies are gone.
+    """
+    gzip = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == ExportFormat.CSV:
+        writer.writerow(CSV_COLUMNS)
+
+    def drain() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return gzip.compress(data) if gzip else data
+
+    async with AsyncSessionLocal() as db:
+        async for item in _export_items(db, user_id):
+            if format == ExportFormat.NDJSON:
+                buffer.write(_ndjson_line(item))
+            elif item[1] is not None:
+                (chat_id, title, _), (message_id, created_at, is_user, content) = item
+                writer.writerow((
+                    chat_id, _csv_text(title), message_id, _timestamp(created_at), is_user, _csv_text(content)
+                ))
+            if buffer.tell() >= CHUNK_SIZE:
+                chunk = drain()
+                if chunk:
+                    yield chunk
+
+    chunk = drain()
+    if gzip:
+        chunk += gzip.flush()
+    if chunk:
+        yield chunk
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, Dict, Hashable, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.services.astro import get_astro_response, stream_astro_response
+
+Positions = Optional[Dict[str, float]]
+# {"summary": str, "turns": [{"role", "content"}, ...]}, see app.services.context
+Context = Optional[dict]
+
+class ResponseBackend(ABC):
+    """Generates assistant replies for chat messages.
+
+    Every upstream call runs under a per-backend semaphore and timeout, and
+    identical prompts that are already in flight share a single upstream call
+    (single-flight) instead of each issuing their own.
+    """
+
+    def __init__(self, max_concurrency: int, timeout: float):
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight: Dict[Hashable, "asyncio.Future[str]"] = {}
+
+    @abstractmethod
+    async def _generate(self, prompt: str, user_name: str, positions: Positions, context: Context) -> str:
+        ...
+
+    async def _stream(self, prompt: str, user_name: str, positions: Positions, context: Context) -> AsyncIterator[str]:
+        yield await self._generate(prompt, user_name, positions, context)
+
+    async def _limited_generate(self, prompt: str, user_name: str, positions: Positions, context: Context) -> str:
+        async with self._semaphore:
+            try:
+                return await asyncio.wait_for(self._generate(prompt, user_name, positions, context), self.timeout)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=504, detail="Response generation timed out")
+
+    async def generate(self, prompt: str, user_name: str = "", positions: Positions = None, context: Context = None) -> str:
+        key = (
+            prompt,
+            user_name,
+            tuple(sorted(positions.items())) if positions else None,
+            json.dumps(context, sort_keys=True) if context else None,
+        )
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._limited_generate(prompt, user_name, positions, context))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # Shield the shared call so one caller disconnecting doesn't cancel it for the rest
+        return await asyncio.shield(task)
+
+    async def stream(self, prompt: str, user_name: str = "", positions: Positions = None, context: Context = None) -> AsyncIterator[str]:
+        """Yield the reply in chunks.
+
+        Streams hold a concurrency slot for their whole duration but aren't
+        coalesced; backends enforce the timeout per chunk read.
+        """
+        async with self._semaphore:
+            chunks = self._stream(prompt, user_name, positions, context)
+            try:
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+    async def aclose(self) -> None:
+        pass
+
+class MockBackend(ResponseBackend):
+    """The built-in canned-reading generator; it has no use for conversation context."""
+
+    async def _generate(self, prompt: str, user_name: str, positions: Positions, context: Context) -> str:
+        return get_astro_response(prompt, user_name, positions)
+
+    async def _stream(self, prompt: str, user_name: str, positions: Positions, context: Context) -> AsyncIterator[str]:
+        async for chunk in stream_astro_response(prompt, user_name, positions):
+            yield chunk
+
+class HTTPBackend(ResponseBackend):
+    """Calls an external model service over a pooled keep-alive HTTP client.
+
+    The service receives ``{"prompt", "user_name", "positions", "context",
+    "stream"}`` as JSON, where ``context`` is the chat's rolling summary and
+    recent turns. It answers ``{"text": ...}``, or a chunked plain-text body
+    when ``stream`` is true.
+    """
+
+    def __init__(self, url: str, max_concurrency: int, timeout: float):
+        super().__init__(max_concurrency, timeout)
+        self.url = url
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+
+    def _payload(self, prompt: str, user_name: str, positions: Positions, context: Context, stream: bool) -> dict:
+        return {"prompt": prompt, "user_name": user_name, "positions": positions, "context": context, "stream": stream}
+
+    async def _generate(self, prompt: str, user_name: str, positions: Positions, context: Context) -> str:
+        try:
+            response = await self._client.post(self.url, json=self._payload(prompt, user_name, positions, context, False))
+            response.raise_for_status()
+            return response.json()["text"]
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Response generation timed out")
+        except (httpx.HTTPError, KeyError, ValueError):
+            raise HTTPException(status_code=502, detail="Response generator unavailable")
+
+    async def _stream(self, prompt: str, user_name: str, positions: Positions, context: Context) -> AsyncIterator[str]:
+        payload = self._payload(prompt, user_name, positions, context, True)
+        try:
+            async with self._client.stream("POST", self.url, json=payload) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_text():
+                    if chunk:
+                        yield chunk
+        except httpx.TimeoutException:
+            raise HTTPException(status_code=504, detail="Response generation timed out")
+        except httpx.HTTPError:
+            raise HTTPException(status_code=502, detail="Response generator unavailable")
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+_backend: Optional[ResponseBackend] = None
+
+def get_response_backend() -> ResponseBackend:
+    """Return the process-wide backend selected by ``RESPONSE_BACKEND``."""
+    global _backend
+    if _backend is None:
+        if settings.RESPONSE_BACKEND == "http":
+            if not settings.RESPONSE_BACKEND_URL:
+                raise RuntimeError("RESPONSE_BACKEND_URL must be set for the http response backend")
+            _backend = HTTPBackend(
+                settings.RESPONSE_BACKEND_URL,
+                max_concurrency=settings.RESPONSE_BACKEND_MAX_CONCURRENCY,
+                timeout=settings.RESPONSE_BACKEND_TIMEOUT,
+            )
+        else:
+            _backend = MockBackend(
+                max_concurrency=settings.RESPONSE_BACKEND_MAX_CONCURRENCY,
+                timeout=settings.RESPONSE_BACKEND_TIMEOUT,
+            )
+    return _backend
+
+async def close_response_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.aclose()
+        _backend = None
@@ -0,0 +1,274 @@
+"""
+Write-behind buffering for chat messages.
+
+With ``MESSAGE_WRITE_BEHIND`` enabled, new messages are not inserted by the
+request that creates them. They get their ids up front (a block at a time
+from the ``messages`` id sequence), go into a bounded in-process queue, and
+a background task writes them in bulk: one multi-row INSERT per batch of up
+to ``MESSAGE_FLUSH_SIZE`` rows, or every ``MESSAGE_FLUSH_INTERVAL`` seconds,
+whichever comes first. The same transaction bumps ``updated_at`` and
+advances the rolling context of the chats involved.
+
+A full queue pushes back on callers, which fail with 503 after
+``MESSAGE_ENQUEUE_TIMEOUT``. Rows stay visible through ``pending()`` until
+their batch commits, so reads of the owning chat see them straight away.
+Everything still queued is written on shutdown.
+
+A batch that fails to write is retried with backoff for as long as the
+database is unreachable; meanwhile the queue fills and callers get 503s.
+Rows are never dropped for connectivity errors. A batch the database rejects
+(``IntegrityError``/``DataError``), or one that still fails after
+``MESSAGE_FLUSH_MAX_ATTEMPTS`` tries while ``SELECT 1`` succeeds, is split in
+halves and each half written on its own, so one bad row cannot hold up the
+rest. Only a row the database rejects on its own is logged in full and
+dropped.
+
+On SQLite, blocks are reserved by advancing the ``messages`` row of
+``sqlite_sequence``. ``messages`` is an AUTOINCREMENT table, so plain inserts
+never reuse an id below it either. SQLite serializes that UPDATE, which
+makes reservation safe across worker processes.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func, insert, text, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.base import AsyncSessionLocal
+from app.models.user import Chat, Message
+from app.services.context import advance_context, make_turn
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+class MessageWriter:
+    def __init__(
+        self,
+        session_factory,
+        max_pending: int,
+        batch_size: int,
+        flush_interval: float,
+        enqueue_timeout: float,
+        max_attempts: int,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self.max_attempts = max_attempts
+        self.flushed = 0
+        self.batches = 0
+        self.dropped = 0
+        self._session_factory = session_factory
+        self._queue: "asyncio.Queue[Optional[List[dict]]]" = asyncio.Queue(maxsize=max_pending)
+        # chat id -> message id -> row, for rows not yet committed
+        self._pending: Dict[int, Dict[int, dict]] = {}
+        self._ids: Deque[int] = deque()
+        self._id_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _reserve_ids(self, db: AsyncSession, count: int) -> List[int]:
+        async with self._id_lock:
+            if len(self._ids) < count:
+                block = max(count, self.batch_size)
+                if db.get_bind().dialect.name == "postgresql":
+                    ids = (await db.scalars(
+                        text("SELECT nextval(pg_get_serial_sequence('messages', 'id')) FROM generate_series(1, :n)"),
+                        {"n": block},
+                    )).all()
+                else:
+                    # The sequence row only appears with the first insert; seed it from the current maximum
+                    await db.execute(text(
+                        "INSERT INTO sqlite_sequence (name, seq) "
+                        "SELECT 'messages', (SELECT coalesce(max(id), 0) FROM messages) "
+                        "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'messages')"
+                    ))
+                    end = await db.scalar(
+                        text("UPDATE sqlite_sequence SET seq = seq + :n WHERE name = 'messages' RETURNING seq"),
+                        {"n": block},
+                    )
+                    ids = range(end - block + 1, end + 1)
+                self._ids.extend(ids)
+            return [self._ids.popleft() for _ in range(count)]
+
+    def _forget(self, rows: List[dict]) -> None:
+        for row in rows:
+            chat_rows = self._pending.get(row["chat_id"])
+            if chat_rows is not None:
+                chat_rows.pop(row["id"], None)
+                if not chat_rows:
+                    del self._pending[row["chat_id"]]
+
+    async def submit(self, db: AsyncSession, rows: List[dict]) -> List[Message]:
+        """Queue message rows for writing and return them as (unsaved) messages.
+
+        Ids are reserved through ``db``, whose transaction is then ended so the
+        caller holds no pooled connection while it waits for queue space.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        ids = await self._reserve_ids(db, len(rows))
+        await db.commit()
+        for row, message_id in zip(rows, ids):
+            row["id"] = message_id
+            self._pending.setdefault(row["chat_id"], {})[message_id] = row
+        try:
+            await asyncio.wait_for(self._queue.put(rows), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self._forget(rows)
+            raise HTTPException(
+                status_code=503,
+                detail="Too many messages are waiting to be saved. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        return [Message(**row) for row in rows]
+
+    def pending(self, chat_id: int) -> List[Message]:
+        """Messages of a chat that are queued but not yet committed, oldest first."""
+        rows = self._pending.get(chat_id)
+        if not rows:
+            return []
+        return [Message(**row) for row in sorted(rows.values(), key=lambda r: (r["created_at"], r["id"]))]
+
+    def discard(self, chat_ids: Iterable[int]) -> None:
+        """Stop showing queued messages of deleted chats; the flush skips their rows anyway."""
+        for chat_id in chat_ids:
+            self._pending.pop(chat_id, None)
+
+    async def _write(self, rows: List[dict]) -> None:
+        async with self._session_factory() as db:
+            # Touch the chats and learn which still exist; rows of deleted chats are dropped
+            chats = {chat.id: chat for chat in await db.execute(
+                update(Chat)
+                .where(Chat.id.in_({row["chat_id"] for row in rows}))
+                .values(updated_at=func.now())
+                .returning(Chat.id, Chat.context_summary, Chat.context_turns)
+            )}
+            rows = [row for row in rows if row["chat_id"] in chats]
+            if rows:
+                new_turns: Dict[int, List[dict]] = {}
+                for row in rows:
+                    new_turns.setdefault(row["chat_id"], []).append(make_turn(row["is_user"], row["content"]))
+                contexts = [
+                    {"id": chat_id, **await advance_context(
+                        db, chat_id, chats[chat_id].context_summary, chats[chat_id].context_turns, turns
+                    )}
+                    for chat_id, turns in new_turns.items()
+                ]
+                await db.execute(insert(Message).values(rows))
+                await db.execute(update(Chat), contexts)
+            await db.commit()
+        self.flushed += len(rows)
+        self.batches += 1
+
+    async def _reachable(self) -> bool:
+        try:
+            async with self._session_factory() as db:
+                await db.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+    async def _write_rows(self, rows: List[dict]) -> None:
+        """Write rows, waiting out outages and splitting around rows the database rejects."""
+        delay = 0.1
+        failures = 0
+        while True:
+            try:
+                await self._write(rows)
+                return
+            except (IntegrityError, DataError):
+                if len(rows) == 1:
+                    self.dropped += 1
+                    logger.exception("Dropping buffered message the database rejected: %r", rows[0])
+                    return
+                logger.exception("The database rejected a batch of %d buffered messages, splitting it", len(rows))
+                break
+            except Exception:
+                failures += 1
+                # Only narrow a batch down once the database is known to be up
+                if failures >= self.max_attempts and len(rows) > 1 and await self._reachable():
+                    logger.exception("Writing %d buffered messages failed %d times, splitting the batch", len(rows), failures)
+                    break
+                # Keep the rows; the queue fills up and callers get backpressure meanwhile
+                logger.exception("Writing %d buffered messages failed, retrying in %.1fs", len(rows), delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 5.0)
+        middle = len(rows) // 2
+        await self._write_rows(rows[:middle])
+        await self._write_rows(rows[middle:])
+
+    async def _flush(self, rows: List[dict]) -> None:
+        await self._write_rows(rows)
+        self._forget(rows)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            rows = list(item)
+            deadline = loop.time() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stopping = True
+                    break
+                rows.extend(item)
+            await self._flush(rows)
+
+    async def aclose(self) -> None:
+        """Write everything still queued, then stop the background task."""
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "pending_messages": sum(len(rows) for rows in self._pending.values()),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "dropped": self.dropped,
+        }
+
+_writer: Optional[MessageWriter] = None
+
+def get_message_writer() -> Optional[MessageWriter]:
+    """The process-wide writer, or None when messages are written synchronously."""
+    global _writer
+    if _writer is None and settings.MESSAGE_WRITE_BEHIND:
+        _writer = MessageWriter(
+            AsyncSessionLocal,
+            max_pending=settings.MESSAGE_BUFFER_SIZE,
+            batch_size=settings.MESSAGE_FLUSH_SIZE,
+            flush_interval=settings.MESSAGE_FLUSH_INTERVAL,
+            enqueue_timeout=settings.MESSAGE_ENQUEUE_TIMEOUT,
+            max_attempts=settings.MESSAGE_FLUSH_MAX_ATTEMPTS,
+        )
+    return _writer
+
+async def close_message_writer() -> None:
+    global _writer
+    if _writer is not None:
+        await _writer.aclose()
+        _writer = None
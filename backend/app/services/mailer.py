@@ -0,0 +1,243 @@
+"""
+Outgoing email over a small pool of persistent SMTP connections.
+
+Messages are queued and sent by ``SMTP_POOL_SIZE`` worker tasks, each with
+its own connection, opened (and authenticated) on first use and kept open
+between batches. A worker takes up to ``SMTP_BATCH_SIZE`` queued messages
+at a time and sends them back to back over its connection, so a burst of
+sign-ups costs a few SMTP sessions rather than one per message.
+Connections idle for ``SMTP_IDLE_TIMEOUT`` seconds are closed. With
+``SMTP_RATE_LIMIT`` set, sends across all connections are paced to at most
+that many messages per second.
+
+Transient failures (dropped connections, timeouts, 4xx replies) are retried
+on a fresh connection with exponential backoff, up to ``SMTP_MAX_ATTEMPTS``
+tries; permanent 5xx rejections are logged and dropped. Everything still
+queued is sent on shutdown.
+
+Point ``SMTP_SERVER``/``SMTP_PORT`` at a local sink with ``SMTP_STARTTLS``
+and ``SMTP_USE_CREDENTIALS`` off to test delivery without a real server.
+"""
+
+import asyncio
+import logging
+from email.message import EmailMessage
+from typing import Dict, List, Optional
+
+import aiosmtplib
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_STOP = None
+
+class EmailDispatcher:
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str],
+        password: Optional[str],
+        use_tls: bool,
+        start_tls: bool,
+        validate_certs: bool,
+        pool_size: int,
+        batch_size: int,
+        max_queued: int,
+        max_attempts: int,
+        timeout: float,
+        idle_timeout: float,
+        rate_limit: Optional[float] = None,
+    ):
+        self.hostname = hostname
+        self.port = port
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.idle_timeout = idle_timeout
+        self.rate_limit = rate_limit
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.connections = 0
+        self._username = username
+        self._password = password
+        self._use_tls = use_tls
+        self._start_tls = start_tls
+        self._validate_certs = validate_certs
+        self._timeout = timeout
+        self._queue: "asyncio.Queue[Optional[EmailMessage]]" = asyncio.Queue(maxsize=max_queued)
+        self._workers: List[asyncio.Task] = []
+        self._next_send = 0.0
+
+    def _start(self) -> None:
+        # Replace any worker that died, so queued mail is never left without a sender
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        self._workers += [asyncio.create_task(self._run()) for _ in range(self.pool_size - len(self._workers))]
+
+    async def send(self, message: EmailMessage) -> None:
+        """Queue a message; waits for room when the queue is full."""
+        self._start()
+        await self._queue.put(message)
+
+    async def join(self) -> None:
+        """Wait until every message queued so far has been sent or given up on."""
+        await self._queue.join()
+
+    async def _throttle(self) -> None:
+        if not self.rate_limit:
+            return
+        now = asyncio.get_running_loop().time()
+        slot = max(now, self._next_send)
+        self._next_send = slot + 1 / self.rate_limit
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self._use_tls,
+            start_tls=self._start_tls,
+            validate_certs=self._validate_certs,
+            timeout=self._timeout,
+        )
+        await smtp.connect()
+        if self._username:
+            await smtp.login(self._username, self._password)
+        self.connections += 1
+        return smtp
+
+    async def _disconnect(self, smtp: Optional[aiosmtplib.SMTP]) -> None:
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except (aiosmtplib.SMTPException, OSError):
+                smtp.close()
+
+    async def _deliver(self, smtp: Optional[aiosmtplib.SMTP], message: EmailMessage) -> Optional[aiosmtplib.SMTP]:
+        """Send one message, reconnecting as needed; returns the connection to keep using."""
+        delay = 0.5
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                if smtp is None or not smtp.is_connected:
+                    smtp = await self._connect()
+                await self._throttle()
+                await smtp.send_message(message)
+                self.sent += 1
+                return smtp
+            except aiosmtplib.SMTPRecipientsRefused as exc:
+                logger.error("Email to %s refused: %s", message["To"], exc.recipients)
+                break
+            except aiosmtplib.SMTPResponseException as exc:
+                if exc.code >= 500:
+                    logger.error("Email to %s rejected: %s %s", message["To"], exc.code, exc.message)
+                    break
+                error = exc
+            except (aiosmtplib.SMTPException, OSError, asyncio.TimeoutError) as exc:
+                error = exc
+            # The connection may be in any state after a failure; start the next try afresh
+            await self._disconnect(smtp)
+            smtp = None
+            if attempt < self.max_attempts:
+                self.retries += 1
+                logger.warning("Sending email to %s failed (%s), retrying in %.1fs", message["To"], error, delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            else:
+                logger.error("Giving up on email to %s after %d attempts: %s", message["To"], attempt, error)
+        self.failed += 1
+        return smtp
+
+    async def _run(self) -> None:
+        smtp: Optional[aiosmtplib.SMTP] = None
+        stopping = False
+        try:
+            while not stopping:
+                try:
+                    message = await asyncio.wait_for(self._queue.get(), self.idle_timeout)
+                except asyncio.TimeoutError:
+                    await self._disconnect(smtp)
+                    smtp = None
+                    continue
+                if message is _STOP:
+                    self._queue.task_done()
+                    break
+                batch = [message]
+                while len(batch) < self.batch_size:
+                    try:
+                        message = self._queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        break
+                    if message is _STOP:
+                        self._queue.task_done()
+                        stopping = True
+                        break
+                    batch.append(message)
+                for message in batch:
+                    try:
+                        smtp = await self._deliver(smtp, message)
+                    except Exception:
+                        # Anything _deliver doesn't expect (a malformed message, a bug)
+                        # costs this message only, not the worker and the rest of the queue
+                        logger.exception("Unexpected error sending email to %s", message["To"])
+                        self.failed += 1
+                        await self._disconnect(smtp)
+                        smtp = None
+                    finally:
+                        self._queue.task_done()
+        finally:
+            await self._disconnect(smtp)
+
+    async def aclose(self) -> None:
+        """Send everything still queued, then close the connections."""
+        if self._workers:
+            self._start()
+            for _ in self._workers:
+                await self._queue.put(_STOP)
+            await asyncio.gather(*self._workers)
+            self._workers = []
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "connections": self.connections,
+        }
+
+def dispatcher_from_settings(**overrides) -> EmailDispatcher:
+    """A dispatcher for ``SMTP_SERVER`` configured from settings, with ``overrides`` applied."""
+    options = dict(
+        username=settings.SMTP_USERNAME if settings.SMTP_USE_CREDENTIALS else None,
+        password=settings.SMTP_PASSWORD if settings.SMTP_USE_CREDENTIALS else None,
+        use_tls=settings.SMTP_SSL_TLS,
+        start_tls=settings.SMTP_STARTTLS,
+        validate_certs=settings.SMTP_VALIDATE_CERTS,
+        pool_size=settings.SMTP_POOL_SIZE,
+        batch_size=settings.SMTP_BATCH_SIZE,
+        max_queued=settings.SMTP_QUEUE_SIZE,
+        max_attempts=settings.SMTP_MAX_ATTEMPTS,
+        timeout=settings.SMTP_TIMEOUT,
+        idle_timeout=settings.SMTP_IDLE_TIMEOUT,
+        rate_limit=settings.SMTP_RATE_LIMIT,
+    )
+    options.update(overrides)
+    return EmailDispatcher(settings.SMTP_SERVER, settings.SMTP_PORT, **options)
+
+_dispatcher: Optional[EmailDispatcher] = None
+
+def get_email_dispatcher() -> EmailDispatcher:
+    """The process-wide dispatcher for ``SMTP_SERVER``."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = dispatcher_from_settings()
+    return _dispatcher
+
+async def close_email_dispatcher() -> None:
+    global _dispatcher
+    if _dispatcher is not None:
+        await _dispatcher.aclose()
+        _dispatcher = None
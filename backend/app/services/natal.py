@@ -0,0 +1,79 @@
+"""
+Natal charts: computed once from a user's birth data and stored on the user
+row in a compact binary form, with a per-process LRU in front of the column.
+"""
+
+import math
+import struct
+from datetime import date, datetime, time
+from typing import Dict, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.user import User
+from app.services.ephemeris import BODIES, ascendant, ecliptic_longitudes
+
+CHART_VERSION = 1
+
+# version byte, one float32 per body, then the ascendant (NaN when unknown)
+_CHART_FORMAT = struct.Struct(f"<B{len(BODIES) + 1}f")
+
+natal_chart_cache = TTLCache(maxsize=settings.NATAL_CHART_CACHE_SIZE, ttl=60 * 60)
+
+def compute_natal_chart(
+    birth_date: date,
+    birth_time: Optional[time] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None
+) -> Dict[str, float]:
+    """Body longitudes at birth (UTC). Without a birth time noon is assumed and
+    the ascendant, which also needs the birth place, is left out."""
+    moment = datetime.combine(birth_date, birth_time or time(12, 0))
+    chart = {body: float(values[0]) for body, values in ecliptic_longitudes([moment]).items()}
+    if birth_time is not None and latitude is not None and longitude is not None:
+        chart["ascendant"] = float(ascendant([moment], latitude, longitude)[0])
+    return chart
+
+def pack_chart(chart: Dict[str, float]) -> bytes:
+    return _CHART_FORMAT.pack(
+        CHART_VERSION,
+        *(chart[body] for body in BODIES),
+        chart.get("ascendant", math.nan),
+    )
+
+def unpack_chart(data: bytes) -> Dict[str, float]:
+    version, *values = _CHART_FORMAT.unpack(data)
+    if version != CHART_VERSION:
+        raise ValueError(f"Unsupported natal chart version {version}")
+    *bodies, asc = values
+    chart = dict(zip(BODIES, bodies))
+    if not math.isnan(asc):
+        chart["ascendant"] = asc
+    return chart
+
+def refresh_natal_chart(user: User) -> None:
+    """Recompute the stored chart from the user's current birth fields.
+
+    Callers should evict ``natal_chart_cache`` for the user once committed.
+    """
+    if user.birth_date is None:
+        user.natal_chart = None
+    else:
+        user.natal_chart = pack_chart(compute_natal_chart(
+            user.birth_date, user.birth_time, user.birth_latitude, user.birth_longitude
+        ))
+    natal_chart_cache.delete(user.id)
+
+_MISSING = object()
+
+async def get_natal_positions(db: AsyncSession, user_id: int) -> Optional[Dict[str, float]]:
+    """The user's natal chart, or None if no birth data has been given."""
+    positions = natal_chart_cache.get(user_id, _MISSING)
+    if positions is _MISSING:
+        data = await db.scalar(select(User.natal_chart).where(User.id == user_id))
+        positions = unpack_chart(data) if data else None
+        natal_chart_cache.set(user_id, positions)
+    return positions
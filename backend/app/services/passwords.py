@@ -0,0 +1,108 @@
+"""
+Password hashing off the event loop.
+
+bcrypt is deliberately slow (a few hundred milliseconds per hash at cost 12),
+so hashing inside an ``async`` handler stalls every other request on the
+worker. Hashes run in a process pool of ``PASSWORD_HASH_WORKERS`` processes
+instead, which also lets a login burst use more than one core. At most
+``PASSWORD_HASH_MAX_PENDING`` may be queued or running at once; past that,
+callers get 503 rather than an ever-growing queue of sign-ins. Workers run
+at a lower CPU priority, so on a busy machine request handling comes first.
+If a worker process dies (OOM killer, segfault) the pool is replaced and the
+hash retried once.
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.security import get_password_hash, verify_and_update_password
+
+class PasswordHasher:
+    def __init__(self, workers: Optional[int], max_pending: int):
+        self.max_pending = max_pending
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.workers = workers
+        self._pool = self._new_pool()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=os.nice, initargs=(10,))
+
+    def _replace_pool(self, broken: ProcessPoolExecutor) -> None:
+        # Concurrent callers all see the same broken pool; only the first replaces it
+        if self._pool is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+            self.restarts += 1
+
+    async def _run(self, function: Callable[..., Any], *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Too many sign-ins in progress. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                pool = self._pool
+                try:
+                    result = await loop.run_in_executor(pool, function, *args)
+                except BrokenProcessPool:
+                    self._replace_pool(pool)
+                    continue
+                self.completed += 1
+                return result
+            raise HTTPException(
+                status_code=503,
+                detail="Sign-in is temporarily unavailable. Please try again shortly.",
+                headers={"Retry-After": "1"},
+            )
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """``(valid, new_hash)``; ``new_hash`` is set when the stored hash should be replaced."""
+        return await self._run(verify_and_update_password, password, hashed_password)
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+_hasher: Optional[PasswordHasher] = None
+
+def get_password_hasher() -> PasswordHasher:
+    """The process-wide hasher; its worker processes start on first use."""
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher(
+            workers=settings.PASSWORD_HASH_WORKERS,
+            max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+        )
+    return _hasher
+
+def close_password_hasher() -> None:
+    global _hasher
+    if _hasher is not None:
+        _hasher.close()
+        _hasher = None
@@ -0,0 +1,54 @@
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.base import dialect_insert
+from app.models.user import DailyReading, User
+from app.services.astro import get_personal_reading
+from app.services.ephemeris import sign_of
+from app.services.natal import get_natal_positions, unpack_chart
+
+def compute_reading(job: Tuple[int, str, Optional[bytes], date]) -> Dict:
+    """A ``daily_readings`` row for ``(user_id, user_name, natal_chart, day)``; safe to run in worker processes."""
+    user_id, user_name, natal_chart, day = job
+    sign = sign_of(unpack_chart(natal_chart)["sun"]) if natal_chart else None
+    return {
+        "user_id": user_id,
+        "reading_date": day,
+        "sign": sign,
+        "content": get_personal_reading(user_id, user_name, day, sign),
+    }
+
+def save_readings(db: Session, rows: List[Dict]) -> None:
+    """Bulk-insert readings, leaving any already stored for that user and day untouched."""
+    if not rows:
+        return
+    insert = dialect_insert(db)
+    stmt = insert(DailyReading).on_conflict_do_nothing(index_elements=["user_id", "reading_date"])
+    db.execute(stmt, rows)
+    db.commit()
+
+async def get_user_reading(db: AsyncSession, user: User, day: date) -> DailyReading:
+    """Look up a user's precomputed reading, generating it if the batch job hasn't."""
+    query = select(DailyReading).where(DailyReading.user_id == user.id, DailyReading.reading_date == day)
+    reading = await db.scalar(query)
+    if reading:
+        return reading
+
+    positions = await get_natal_positions(db, user.id)
+    sign = sign_of(positions["sun"]) if positions else None
+    insert = dialect_insert(db)
+    await db.execute(
+        insert(DailyReading).on_conflict_do_nothing(index_elements=["user_id", "reading_date"]),
+        [{
+            "user_id": user.id,
+            "reading_date": day,
+            "sign": sign,
+            "content": get_personal_reading(user.id, user.username or "", day, sign),
+        }],
+    )
+    await db.commit()
+    return await db.scalar(query)
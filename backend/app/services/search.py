@@ -0,0 +1,118 @@
+"""
+Full-text search over a user's chat history.
+
+Postgres matches ``websearch_to_tsquery`` against the generated
+``messages.search_vector`` column (GIN-indexed), ranks with ``ts_rank`` and
+highlights with ``ts_headline``. SQLite runs the same search through the
+``messages_fts`` FTS5 table, using ``bm25`` and ``snippet``. Both are joined
+to ``chats`` on the indexed ``user_id``, so only the caller's chats are
+searched.
+
+Snippets are HTML: message text is escaped, then matched terms are wrapped in
+``<mark>``. The database marks matches with private-use characters rather
+than the tags themselves, so only the highlighting survives as markup.
+
+Hits come best first, ties newest first. The cursor carries the last hit's
+(score, message id), so the next page continues from where this one ended.
+"""
+
+import base64
+import html
+import re
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Boolean, DateTime, Float, Integer, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# Placeholders for the highlight tags until the snippet has been escaped
+_MATCH_START = "\ue000"
+_MATCH_END = "\ue001"
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+# Typed so the "no cursor" NULLs bind cleanly on asyncpg, and so SQLite hands back datetimes
+_CURSOR_PARAMS = (bindparam("after_score", type_=Float), bindparam("after_id", type_=Integer))
+_RESULT_TYPES = dict(message_id=Integer, chat_id=Integer, is_user=Boolean, created_at=DateTime, score=Float)
+
+_POSTGRES_SEARCH = text(f"""
+    SELECT * FROM (
+        SELECT m.id AS message_id, m.chat_id, c.title AS chat_title, m.is_user, m.created_at,
+               ts_rank(m.search_vector, query)::float8 AS score,
+               ts_headline('english', m.content, query,
+                           'StartSel={_MATCH_START}, StopSel={_MATCH_END}, MaxWords=30, MinWords=10') AS snippet
+        FROM messages m
+        JOIN chats c ON c.id = m.chat_id,
+             websearch_to_tsquery('english', :query) AS query
+        WHERE c.user_id = :user_id AND m.search_vector @@ query
+    ) hits
+    WHERE :after_score IS NULL OR (score, message_id) < (:after_score, :after_id)
+    ORDER BY score DESC, message_id DESC
+    LIMIT :limit
+""").bindparams(*_CURSOR_PARAMS).columns(**_RESULT_TYPES)
+
+_SQLITE_SEARCH = text(f"""
+    SELECT * FROM (
+        SELECT m.id AS message_id, m.chat_id, c.title AS chat_title, m.is_user, m.created_at,
+               -bm25(messages_fts) AS score,
+               snippet(messages_fts, 0, '{_MATCH_START}', '{_MATCH_END}', '…', 24) AS snippet
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        JOIN chats c ON c.id = m.chat_id
+        WHERE messages_fts MATCH :query AND c.user_id = :user_id
+    ) hits
+    WHERE :after_score IS NULL OR score < :after_score OR (score = :after_score AND message_id < :after_id)
+    ORDER BY score DESC, message_id DESC
+    LIMIT :limit
+""").bindparams(*_CURSOR_PARAMS).columns(**_RESULT_TYPES)
+
+def _fts5_query(q: str) -> str:
+    """Quote each word so user input can't break FTS5 query syntax (terms are ANDed)."""
+    return " ".join(f'"{word}"' for word in _WORD.findall(q))
+
+def _highlight(snippet: str) -> str:
+    """Escape a raw snippet for HTML, then turn its match placeholders into tags."""
+    escaped = html.escape(snippet)
+    return escaped.replace(_MATCH_START, HIGHLIGHT_START).replace(_MATCH_END, HIGHLIGHT_END)
+
+def encode_search_cursor(score: float, message_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{score!r}|{message_id}".encode()).decode()
+
+def decode_search_cursor(cursor: str) -> Tuple[float, int]:
+    try:
+        score, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return float(score), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def search_messages(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    after: Optional[str] = None,
+    limit: int = 20
+) -> dict:
+    """One page of the user's messages matching ``q``, best match first."""
+    after_score, after_id = decode_search_cursor(after) if after else (None, None)
+    if db.get_bind().dialect.name == "postgresql":
+        statement, query = _POSTGRES_SEARCH, q
+    else:
+        statement, query = _SQLITE_SEARCH, _fts5_query(q)
+        if not query:
+            return {"results": [], "next_cursor": None}
+
+    rows = (await db.execute(statement, {
+        "query": query,
+        "user_id": user_id,
+        "after_score": after_score,
+        "after_id": after_id,
+        "limit": limit + 1,
+    })).mappings().all()
+    results = [{**row, "snippet": _highlight(row["snippet"])} for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = results[-1]
+        next_cursor = encode_search_cursor(last["score"], last["message_id"])
+    return {"results": results, "next_cursor": next_cursor}
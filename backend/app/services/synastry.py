@@ -0,0 +1,96 @@
+"""
+Synastry (chart-to-chart compatibility) scoring.
+
+A chart is an array of ecliptic longitudes ordered like
+``app.services.ephemeris.BODIES``. Every body in one chart is compared with
+every body in the other; the angular separations are matched against the
+major aspects, and harmonious or tense contacts are weighted by how exact
+they are and how personal the bodies involved are. Batch scoring broadcasts
+one chart against an ``(N, bodies)`` array, so there is no per-pair Python loop.
+"""
+
+from typing import Dict, List, Mapping
+
+import numpy as np
+
+from app.services.ephemeris import BODIES
+
+# name, exact angle, orb (degrees), harmony (+ supportive, - challenging)
+ASPECTS = (
+    ("conjunction", 0.0, 8.0, 1.0),
+    ("sextile", 60.0, 4.0, 0.5),
+    ("square", 90.0, 6.0, -0.75),
+    ("trine", 120.0, 6.0, 1.0),
+    ("opposition", 180.0, 7.0, -0.5),
+)
+
+BODY_WEIGHTS = {
+    "sun": 1.5, "moon": 1.5, "mercury": 1.0, "venus": 1.25, "mars": 1.25,
+    "jupiter": 0.75, "saturn": 0.75, "uranus": 0.25, "neptune": 0.25, "pluto": 0.25,
+}
+
+_ANGLES = np.array([a[1] for a in ASPECTS], dtype=np.float32)
+_ORBS = np.array([a[2] for a in ASPECTS], dtype=np.float32)
+_HARMONY = np.array([a[3] for a in ASPECTS], dtype=np.float32)
+_WEIGHTS = np.array([BODY_WEIGHTS[b] for b in BODIES], dtype=np.float32)
+_PAIR_WEIGHTS = np.outer(_WEIGHTS, _WEIGHTS)
+
+# Raw scores are squashed through tanh onto 0-100; this is the raw value that maps to ~88
+_SCORE_SCALE = 6.0
+
+def chart_array(positions: Mapping[str, float]) -> np.ndarray:
+    """Pack a ``{body: longitude}`` mapping into a chart array."""
+    return np.array([positions[b] for b in BODIES], dtype=np.float32)
+
+def _separations(chart: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Shortest angular distance (0-180) between every body pair, shape ``(..., B, B)``."""
+    diff = np.abs(chart[..., :, None] - others[..., None, :])
+    return np.minimum(diff, 360.0 - diff)
+
+def _aspect_strengths(separations: np.ndarray) -> np.ndarray:
+    """Exactness (1 = exact, 0 = outside orb) of each aspect, shape ``(..., B, B, A)``."""
+    deviation = np.abs(separations[..., None] - _ANGLES)
+    return np.clip(1.0 - deviation / _ORBS, 0.0, 1.0)
+
+def _raw_scores(strengths: np.ndarray) -> np.ndarray:
+    return np.einsum("...ija,a,ij->...", strengths, _HARMONY, _PAIR_WEIGHTS)
+
+def _to_percent(raw: np.ndarray) -> np.ndarray:
+    return 50.0 + 50.0 * np.tanh(raw / _SCORE_SCALE)
+
+def score_batch(chart: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """Compatibility scores (0-100) of one chart against ``(N, B)`` candidate charts."""
+    candidates = np.asarray(candidates, dtype=np.float32)
+    strengths = _aspect_strengths(_separations(chart[None, :], candidates))
+    return _to_percent(_raw_scores(strengths))
+
+def aspect_matrix(chart_a: np.ndarray, chart_b: np.ndarray) -> Dict[str, np.ndarray]:
+    """Per body pair: separation, strongest aspect index (-1 if none) and its exactness."""
+    separations = _separations(chart_a, chart_b)
+    strengths = _aspect_strengths(separations)
+    best = strengths.argmax(axis=-1)
+    exactness = np.take_along_axis(strengths, best[..., None], axis=-1)[..., 0]
+    return {
+        "separation": separations,
+        "aspect": np.where(exactness > 0, best, -1),
+        "exactness": exactness,
+    }
+
+def synastry_report(chart_a: np.ndarray, chart_b: np.ndarray) -> Dict:
+    """Score two charts and list their aspects, strongest first."""
+    matrix = aspect_matrix(chart_a, chart_b)
+    score = float(_to_percent(_raw_scores(_aspect_strengths(matrix["separation"]))))
+
+    aspects: List[Dict] = []
+    for i, j in zip(*np.nonzero(matrix["aspect"] >= 0)):
+        name, angle, _, harmony = ASPECTS[matrix["aspect"][i, j]]
+        aspects.append({
+            "body_a": BODIES[i],
+            "body_b": BODIES[j],
+            "aspect": name,
+            "orb": round(abs(float(matrix["separation"][i, j]) - angle), 2),
+            "harmonious": harmony > 0,
+            "weight": round(float(matrix["exactness"][i, j] * _PAIR_WEIGHTS[i, j]), 3),
+        })
+    aspects.sort(key=lambda a: a["weight"], reverse=True)
+    return {"score": round(score, 1), "aspects": aspects}
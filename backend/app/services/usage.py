@@ -0,0 +1,92 @@
+"""
+Per-user usage quotas for metered features.
+
+Usage is kept in ``usage_counters``, one row per (user, metric, month), so a
+quota check never has to count a user's history. A single
+``INSERT ... ON CONFLICT DO UPDATE ... WHERE count + n <= limit RETURNING``
+both checks and increments: no row back means the quota is used up. Metrics
+without a limit for the user's tier are not counted at all. Charges for
+something that then fails to be delivered, such as a reply the response
+backend never produced, are given back with ``refund_quota`` against the month
+``consume_quota`` charged, even if the request has run past its end.
+"""
+
+from datetime import date, datetime
+from typing import Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.base import dialect_insert
+from app.models.user import SubscriptionTier, UsageCounter
+
+# Monthly limits per tier; a missing metric (or None) means unlimited
+QUOTAS: Dict[SubscriptionTier, Dict[str, Optional[int]]] = {
+    SubscriptionTier.FREE: {"chats": settings.MAX_FREE_CHATS, "messages": settings.MAX_FREE_MESSAGES},
+    SubscriptionTier.BASIC: {},
+    SubscriptionTier.PREMIUM: {},
+    SubscriptionTier.PROFESSIONAL: {},
+}
+
+def effective_tier(user) -> SubscriptionTier:
+    """The user's tier, falling back to FREE once a paid plan has expired."""
+    if user.subscription_expiry is not None and user.subscription_expiry < datetime.utcnow():
+        return SubscriptionTier.FREE
+    return user.subscription_tier
+
+def current_period(today: Optional[date] = None) -> date:
+    return (today or datetime.utcnow().date()).replace(day=1)
+
+async def consume_quota(
+    db: AsyncSession, user, metric: str, amount: int = 1, commit: bool = True
+) -> Optional[date]:
+    """Count ``amount`` of ``metric`` against the user's monthly quota, or raise 402.
+
+    Returns the month charged, for ``refund_quota``, or None when the metric
+    isn't metered for the user's tier. With ``commit=False`` the increment
+    joins the caller's transaction, so it is undone if whatever it pays for is
+    never stored.
+    """
+    tier = effective_tier(user)
+    limit = QUOTAS[tier].get(metric)
+    if limit is None:
+        return None
+
+    period = current_period()
+    insert = dialect_insert(db)
+    stmt = insert(UsageCounter).values(
+        user_id=user.id, metric=metric, period_start=period, count=amount
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "metric", "period_start"],
+        set_={"count": UsageCounter.count + stmt.excluded.count},
+        where=UsageCounter.count + stmt.excluded.count <= limit,
+    ).returning(UsageCounter.count)
+
+    if amount > limit or (await db.execute(stmt)).first() is None:
+        await db.rollback()
+        raise HTTPException(
+            status_code=402,
+            detail=f"Monthly {metric} limit of the {tier.value} plan reached. Please upgrade to continue.",
+        )
+    if commit:
+        await db.commit()
+    return period
+
+async def refund_quota(db: AsyncSession, user, metric: str, period: Optional[date], amount: int = 1) -> None:
+    """Give back ``amount`` of ``metric`` that ``consume_quota`` charged to ``period`` for something never delivered."""
+    if period is None:
+        return
+    await db.execute(
+        update(UsageCounter)
+        .where(
+            UsageCounter.user_id == user.id,
+            UsageCounter.metric == metric,
+            UsageCounter.period_start == period,
+            UsageCounter.count >= amount,
+        )
+        .values(count=UsageCounter.count - amount)
+    )
+    await db.commit()
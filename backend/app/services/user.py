@@ -1,50 +1,76 @@
-from typing import Optional
-from sqlalchemy.orm import Session
+from typing import NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 import datetime
 
 from app.models.user import User, Chat, Message, SubscriptionTier, AuthProvider
-from app.schemas.user import UserCreate
-from app.core.security import get_password_hash, verify_password
+from app.schemas.user import UserCreate, BirthInfo
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services.passwords import get_password_hasher
+from app.services.natal import refresh_natal_chart, natal_chart_cache
 
-def get_user(db: Session, user_id: int) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+class Principal(NamedTuple):
+    """The part of a user that authentication and plan checks need."""
+    id: int
+    username: Optional[str]
+    is_verified: bool
+    subscription_tier: SubscriptionTier
+    subscription_expiry: Optional[datetime.datetime]
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
-    return db.query(User).filter(User.email == email).first()
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(user.id, user.username, user.is_verified, user.subscription_tier, user.subscription_expiry)
 
-def get_user_by_provider_id(db: Session, provider: AuthProvider, provider_user_id: str) -> Optional[User]:
-    return db.query(User).filter(User.auth_provider == provider, User.provider_user_id == provider_user_id).first()
+# Access token -> Principal; entries never outlive their token
+principal_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
 
-def create_user(db: Session, user_in: UserCreate) -> User:
-    user = get_user_by_email(db, email=user_in.email)
+def forget_principal(user_id: int) -> None:
+    """Drop the cached principals of a user after a change to their account."""
+    principal_cache.delete_where(lambda principal: principal.id == user_id)
+
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    return await db.get(User, user_id)
+
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
+    return await db.scalar(select(User).where(User.email == email))
+
+async def get_user_by_provider_id(db: AsyncSession, provider: AuthProvider, provider_user_id: str) -> Optional[User]:
+    return await db.scalar(
+        select(User).where(User.auth_provider == provider, User.provider_user_id == provider_user_id)
+    )
+
+async def create_user(db: AsyncSession, user_in: UserCreate) -> User:
+    user = await get_user_by_email(db, email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
-    
+
     db_user = User(
         email=user_in.email,
         username=user_in.username or user_in.email.split('@')[0],
-        hashed_password=get_password_hash(user_in.password),
+        hashed_password=await get_password_hasher().hash(user_in.password),
         auth_provider=AuthProvider.EMAIL
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def create_social_user(db: Session, email: str, username: str, auth_provider: AuthProvider, provider_user_id: str) -> User:
-    user = get_user_by_email(db, email=email)
+async def create_social_user(db: AsyncSession, email: str, username: str, auth_provider: AuthProvider, provider_user_id: str) -> User:
+    user = await get_user_by_email(db, email=email)
     if user:
         # Update provider info if user exists
         user.auth_provider = auth_provider
         user.provider_user_id = provider_user_id
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        forget_principal(user.id)
+        await db.refresh(user)
         return user
-    
+
     db_user = User(
         email=email,
         username=username,
@@ -53,40 +79,77 @@ def create_social_user(db: Session, email: str, username: str, auth_provider: Au
         provider_user_id=provider_user_id
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
-    user = get_user_by_email(db, email=email)
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
+    user = await get_user_by_email(db, email=email)
     if not user or not user.hashed_password:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await get_password_hasher().verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # Stored with an older or cheaper scheme; upgrade while we have the password
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
-def verify_user_email(db: Session, user_id: int) -> User:
-    user = get_user(db, user_id=user_id)
+async def verify_user_email(db: AsyncSession, user_id: int) -> User:
+    user = await get_user(db, user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
     user.is_verified = True
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    forget_principal(user.id)
+    await db.refresh(user)
     return user
 
-def update_subscription(db: Session, user_id: int, tier: SubscriptionTier, months: int = 1) -> User:
-    user = get_user(db, user_id=user_id)
+async def update_subscription(db: AsyncSession, user_id: int, tier: SubscriptionTier, months: int = 1) -> User:
+    user = await get_user(db, user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    
+
     user.subscription_tier = tier
-    
+
     if user.subscription_expiry and user.subscription_expiry > datetime.datetime.utcnow():
         user.subscription_expiry = user.subscription_expiry + datetime.timedelta(days=30*months)
     else:
         user.subscription_expiry = datetime.datetime.utcnow() + datetime.timedelta(days=30*months)
-        
-    db.commit()
-    db.refresh(user)
-    return user
\ No newline at end of file
+
+    await db.commit()
+    forget_principal(user.id)
+    await db.refresh(user)
+    return user
+
+async def update_birth_info(db: AsyncSession, user_id: int, birth_info: BirthInfo) -> User:
+    user = await get_user(db, user_id=user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    changed = False
+    for field, value in birth_info.dict().items():
+        if getattr(user, field) != value:
+            setattr(user, field, value)
+            changed = True
+
+    # The chart only depends on birth data, so it is computed here and never per message
+    if changed:
+        refresh_natal_chart(user)
+
+    await db.commit()
+    natal_chart_cache.delete(user.id)
+    await db.refresh(user)
+    return user
+
+async def update_daily_digest_opt_in(db: AsyncSession, user_id: int, opt_in: bool) -> User:
+    user = await get_user(db, user_id=user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    user.daily_digest_opt_in = opt_in
+    await db.commit()
+    await db.refresh(user)
+    return user
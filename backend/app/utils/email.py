@@ -1,4 +1,6 @@
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
+from email.message import EmailMessage
+from email.utils import make_msgid
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound, select_autoescape
 from pydantic import EmailStr
 from typing import List
 from pathlib import Path
@@ -6,35 +8,36 @@ import jwt
 from datetime import datetime, timedelta
 
 from app.core.config import settings
+from app.services.mailer import get_email_dispatcher
 
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.SMTP_USERNAME,
-    MAIL_PASSWORD=settings.SMTP_PASSWORD,
-    MAIL_FROM=settings.EMAIL_FROM,
-    MAIL_PORT=settings.SMTP_PORT,
-    MAIL_SERVER=settings.SMTP_SERVER,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / "../templates/email"
+# Compiled templates are cached by the environment; templates don't change at runtime
+templates = Environment(
+    loader=FileSystemLoader(Path(__file__).parent / "../templates/email"),
+    autoescape=select_autoescape(["html"]),
+    auto_reload=False,
 )
 
+def render_template(template_name: str, **context) -> str:
+    return templates.get_template(template_name).render(**context)
+
+def build_email(email_to: EmailStr, subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = settings.EMAIL_FROM
+    message["To"] = email_to
+    message["Subject"] = subject
+    message["Message-ID"] = make_msgid()
+    message.set_content(body, subtype="html")
+    return message
+
 async def send_email(
     email_to: List[EmailStr],
     subject: str,
-    body: str,
-    template_name: str = None
+    body: str
 ) -> None:
-    message = MessageSchema(
-        subject=subject,
-        recipients=email_to,
-        body=body,
-        subtype="html"
-    )
-    
-    fm = FastMail(conf)
-    await fm.send_message(message)
+    """Queue an HTML email, one message per recipient, on the shared dispatcher."""
+    dispatcher = get_email_dispatcher()
+    for recipient in email_to:
+        await dispatcher.send(build_email(recipient, subject, body))
 
 def generate_email_verification_token(email: str) -> str:
     expire = datetime.utcnow() + timedelta(hours=24)
@@ -55,24 +58,17 @@ async def send_verification_email(email_to: EmailStr, token: str) -> None:
     project_name = settings.PROJECT_NAME
     subject = f"{project_name} - Verify your email"
     
-    verification_url = f"http://localhost:3000/verify-email?token={token}"
+    verification_url = f"{settings.FRONTEND_URL}/verify-email?token={token}"
     current_year = datetime.now().year
     
-    message = MessageSchema(
-        subject=subject,
-        recipients=[email_to],
-        template_body={
-            "verification_url": verification_url,
-            "current_year": current_year
-        },
-        subtype="html"
-    )
-    
-    fm = FastMail(conf)
     try:
-        await fm.send_message(message, template_name="verification.html")
-    except Exception as e:
-        # Fallback to simple email if template fails
+        body = render_template(
+            "verification.html",
+            verification_url=verification_url,
+            current_year=current_year
+        )
+    except TemplateNotFound:
+        # Fallback to simple email if the template is missing
         body = f"""
         <html>
         <body>
@@ -86,9 +82,9 @@ async def send_verification_email(email_to: EmailStr, token: str) -> None:
         </body>
         </html>
         """
-        
-        await send_email(
-            email_to=[email_to],
-            subject=subject,
-            body=body
-        )
\ No newline at end of file
+    
+    await send_email(
+        email_to=[email_to],
+        subject=subject,
+        body=body
+    )
@@ -0,0 +1,47 @@
+"""
+Micro-benchmark: compiled intent matcher vs. the original per-keyword scan.
+
+The legacy loop stops at the first substring hit, so it does less work per
+query than the matcher, which scores every word to produce a full Intent.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_intent
+"""
+
+import timeit
+
+from app.services.astro import classify_intent
+
+QUERIES = [
+    "What does today hold for me?",
+    "I'm a Scorpio, will my relationship survive this month?",
+    "Should I change my job or start a business this year?",
+    "Leonard here, any advice on health and fitness?",
+    "My partner is a Sagittarius and I'm a Capricorn. Are we compatible in love?",
+    "Tell me something nice about the universe and my energy levels lately, " * 4,
+]
+
+def legacy_classify(query: str):
+    """The loop get_astro_response used before the compiled matcher."""
+    query_lower = query.lower()
+    for sign in ["aries", "taurus", "gemini", "cancer", "leo", "virgo",
+                "libra", "scorpio", "sagittarius", "capricorn", "aquarius", "pisces"]:
+        if sign in query_lower:
+            return sign
+    if any(word in query_lower for word in ["love", "relationship", "partner", "romance", "dating"]):
+        return "love"
+    if any(word in query_lower for word in ["job", "career", "work", "profession", "business"]):
+        return "career"
+    if any(word in query_lower for word in ["health", "wellness", "fitness", "body", "energy"]):
+        return "health"
+    return "general"
+
+def run(number: int = 20000) -> None:
+    for name, fn in (("legacy loop", legacy_classify), ("compiled matcher", classify_intent)):
+        elapsed = timeit.timeit(lambda: [fn(q) for q in QUERIES], number=number)
+        per_call = elapsed / (number * len(QUERIES)) * 1e6
+        print(f"{name:>16}: {per_call:6.2f} us/query")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,94 @@
+"""
+Concurrent-request load test against a running API.
+
+Start a single worker, e.g.
+
+    uvicorn app.main:app --workers 1 --port 8000
+
+then run from the backend directory:
+
+    python -m benchmarks.load_test --concurrency 50 --duration 15
+
+Each client logs in as the given user, opens its own chat and then loops over
+the chosen scenario. The report gives throughput and latency for the worker.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> dict:
+    response = await client.post("/api/v1/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def _client_loop(client, headers, chat_id, scenario, deadline, latencies, errors, credentials):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        if scenario == "messages":
+            response = await client.post(
+                f"/api/v1/chats/{chat_id}/messages", json={"content": "What about my career?"}, headers=headers
+            )
+        elif scenario == "login":
+            response = await client.post("/api/v1/auth/login", data=credentials)
+        elif scenario == "history":
+            response = await client.get(f"/api/v1/chats/{chat_id}/messages", headers=headers)
+        else:
+            response = await client.get("/api/v1/chats/", headers=headers)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+        else:
+            latencies.append(time.perf_counter() - started)
+
+async def run(url: str, email: str, password: str, concurrency: int, duration: float, scenario: str) -> None:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        headers = await _login(client, email, password)
+        chat_ids = []
+        for i in range(concurrency):
+            response = await client.post("/api/v1/chats/", json=f"load test {i}", headers=headers)
+            response.raise_for_status()
+            chat_ids.append(response.json()["id"])
+
+        latencies, errors = [], []
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _client_loop(
+                client, headers, chat_id, scenario, deadline, latencies, errors,
+                {"username": email, "password": password},
+            )
+            for chat_id in chat_ids
+        ))
+        elapsed = time.perf_counter() - started
+
+        for chat_id in chat_ids:
+            await client.delete(f"/api/v1/chats/{chat_id}", headers=headers)
+
+    if not latencies:
+        print(f"No successful requests ({len(errors)} errors)")
+        return
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{scenario}: {len(latencies) / elapsed:.1f} req/s with {concurrency} clients, "
+        f"p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, "
+        f"{len(errors)} errors"
+    )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Concurrent-request load test")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--email", default="admin@astrological-ai.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--scenario", choices=["messages", "history", "list", "login"], default="messages")
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.email, args.password, args.concurrency, args.duration, args.scenario))
+
+if __name__ == "__main__":
+    main()
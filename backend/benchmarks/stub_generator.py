@@ -0,0 +1,52 @@
+"""
+Stand-in for an external model service, speaking the HTTPBackend protocol.
+
+    uvicorn benchmarks.stub_generator:app --port 9000
+
+then start the API with RESPONSE_BACKEND=http and
+RESPONSE_BACKEND_URL=http://localhost:9000/generate. STUB_LATENCY (seconds)
+sets the simulated time per reply.
+"""
+
+import asyncio
+import os
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, Optional
+
+from app.services.astro import get_astro_response
+
+LATENCY = float(os.environ.get("STUB_LATENCY", "0.5"))
+
+app = FastAPI(title="Stub response generator")
+calls = 0
+
+class GenerateRequest(BaseModel):
+    prompt: str
+    user_name: str = ""
+    positions: Optional[Dict[str, float]] = None
+    stream: bool = False
+
+@app.post("/generate")
+async def generate(request: GenerateRequest):
+    global calls
+    calls += 1
+    text = get_astro_response(request.prompt, request.user_name, request.positions)
+    if not request.stream:
+        await asyncio.sleep(LATENCY)
+        return {"text": text}
+
+    words = text.split(" ")
+
+    async def chunks():
+        for i, word in enumerate(words):
+            await asyncio.sleep(LATENCY / len(words))
+            yield word if i == 0 else " " + word
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+@app.get("/stats")
+async def stats():
+    return {"calls": calls}
@@ -17,6 +17,7 @@ import {
   DialogContent,
   DialogContentText,
   DialogTitle,
+  CircularProgress,
   useMediaQuery,
   useTheme,
 } from '@mui/material';
@@ -36,6 +37,9 @@ const ChatSidebar = ({
   onNewChat,
   onDeleteChat,
   onEditChatTitle,
+  hasMoreChats,
+  loadingMoreChats,
+  onLoadMoreChats,
   isMobileSidebarOpen,
   onMobileSidebarClose,
 }) => {
@@ -207,6 +211,17 @@ const ChatSidebar = ({
               </Box>
             )}
           </AnimatePresence>
+          {hasMoreChats && (
+            <Box sx={{ p: 1, textAlign: 'center' }}>
+              <Button
+                size="small"
+                onClick={onLoadMoreChats}
+                disabled={loadingMoreChats}
+              >
+                {loadingMoreChats ? <CircularProgress size={20} /> : 'Load more chats'}
+              </Button>
+            </Box>
+          )}
         </List>
       </Box>
     </Box>
@@ -23,6 +23,24 @@ import api from '../services/api';
 import ChatMessage from '../components/Chat/ChatMessage';
 import ChatSidebar from '../components/Chat/ChatSidebar';
 
+// Chats per page of the sidebar list
+const CHAT_PAGE_SIZE = 50;
+
+// The sidebar lists chat summaries; map a full chat response to one
+const toChatSummary = (chat) => {
+  const messages = chat.messages || [];
+  const lastMessage = messages[messages.length - 1];
+  return {
+    id: chat.id,
+    title: chat.title,
+    created_at: chat.created_at,
+    updated_at: chat.updated_at,
+    message_count: messages.length,
+    last_message_preview: lastMessage ? lastMessage.content : null,
+    last_message_at: lastMessage ? lastMessage.created_at : null,
+  };
+};
+
 const ChatPage = () => {
   const theme = useTheme();
   const navigate = useNavigate();
@@ -34,6 +52,9 @@ const ChatPage = () => {
   const [message, setMessage] = useState('');
   const [activeChat, setActiveChat] = useState(null);
   const [chats, setChats] = useState([]);
+  const [chatsLoaded, setChatsLoaded] = useState(false);
+  const [hasMoreChats, setHasMoreChats] = useState(false);
+  const [loadingMoreChats, setLoadingMoreChats] = useState(false);
   const [loading, setLoading] = useState(true);
   const [sendingMessage, setSendingMessage] = useState(false);
   const [error, setError] = useState(null);
@@ -44,36 +65,86 @@ const ChatPage = () => {
   });
   const [mobileSidebarOpen, setMobileSidebarOpen] = useState(false);
   
-  // Fetch user's chats
+  // Fetch the first page of the user's chats; later pages load on demand
   useEffect(() => {
     const fetchChats = async () => {
       try {
-        setLoading(true);
-        const response = await api.get('/api/v1/chats');
+        const response = await api.get('/api/v1/chats', {
+          params: { limit: CHAT_PAGE_SIZE },
+        });
         setChats(response.data);
-        
-        // If no active chat but chats exist, set the first one as active
-        if (response.data.length > 0 && !chatId) {
-          navigate(`/chat/${response.data[0].id}`);
-        } else if (chatId) {
-          // Find the active chat
-          const chat = response.data.find((c) => c.id === parseInt(chatId));
-          if (chat) {
-            setActiveChat(chat);
-          } else if (response.data.length > 0) {
-            navigate(`/chat/${response.data[0].id}`);
-          }
-        }
+        setHasMoreChats(response.data.length === CHAT_PAGE_SIZE);
+        setChatsLoaded(true);
       } catch (err) {
         console.error('Failed to fetch chats:', err);
         setError('Failed to load chats. Please try again.');
-      } finally {
         setLoading(false);
       }
     };
     
     fetchChats();
-  }, [chatId, navigate]);
+  }, []);
+  
+  // Load the active chat and its latest messages
+  useEffect(() => {
+    if (!chatsLoaded) return;
+    
+    if (!chatId) {
+      // If no active chat but chats exist, set the first one as active
+      if (chats.length > 0) {
+        navigate(`/chat/${chats[0].id}`);
+      } else {
+        setActiveChat(null);
+        setLoading(false);
+      }
+      return;
+    }
+    
+    const id = parseInt(chatId);
+    if (activeChat?.id === id) return;
+    
+    const fetchActiveChat = async () => {
+      try {
+        setLoading(true);
+        // The chat may be on a page of the list that hasn't been loaded yet
+        const chat =
+          chats.find((c) => c.id === id) ||
+          (await api.get(`/api/v1/chats/${id}/meta`)).data;
+        const page = await api.get(`/api/v1/chats/${id}/messages`);
+        setActiveChat({ ...chat, messages: page.data.messages });
+      } catch (err) {
+        if (err.response?.status === 404 && chats.length > 0) {
+          navigate(`/chat/${chats[0].id}`);
+        } else {
+          console.error('Failed to fetch chat:', err);
+          setError('Failed to load chat. Please try again.');
+        }
+      } finally {
+        setLoading(false);
+      }
+    };
+    
+    fetchActiveChat();
+  }, [chatId, chatsLoaded, chats, activeChat, navigate]);
+  
+  const handleLoadMoreChats = async () => {
+    try {
+      setLoadingMoreChats(true);
+      const response = await api.get('/api/v1/chats', {
+        params: { skip: chats.length, limit: CHAT_PAGE_SIZE },
+      });
+      
+      // Activity since the last page can shift chats across pages; skip repeats
+      const known = new Set(chats.map((chat) => chat.id));
+      setChats([...chats, ...response.data.filter((chat) => !known.has(chat.id))]);
+      setHasMoreChats(response.data.length === CHAT_PAGE_SIZE);
+    } catch (err) {
+      console.error('Failed to fetch more chats:', err);
+      setError('Failed to load more chats. Please try again.');
+    } finally {
+      setLoadingMoreChats(false);
+    }
+  };
   
   // Scroll to bottom of messages when they change
   useEffect(() => {
@@ -94,7 +165,7 @@ const ChatPage = () => {
       });
       
       // Add the new chat to the list and navigate to it
-      setChats([response.data, ...chats]);
+      setChats([toChatSummary(response.data), ...chats]);
       navigate(`/chat/${response.data.id}`);
       
       setSnackbar({
@@ -151,14 +222,17 @@ const ChatPage = () => {
     try {
       const response = await api.put(`/api/v1/chats/${id}`, { title });
       
-      // Update the chat in the list
+      // Update the chat in the list, keeping its summary fields
+      const { title: newTitle, updated_at: updatedAt } = response.data;
       setChats(
-        chats.map((chat) => (chat.id === id ? response.data : chat))
+        chats.map((chat) =>
+          chat.id === id ? { ...chat, title: newTitle, updated_at: updatedAt } : chat
+        )
       );
       
-      // Update active chat if it's the one being edited
+      // Update active chat if it's the one being edited; its loaded messages stay as they are
       if (activeChat?.id === id) {
-        setActiveChat(response.data);
+        setActiveChat({ ...activeChat, title: newTitle, updated_at: updatedAt });
       }
       
       setSnackbar({
@@ -191,13 +265,16 @@ const ChatPage = () => {
         messages: [...activeChat.messages, ...response.data],
       });
       
-      // Also update the chat in the list
+      // Also update the chat summary in the list
+      const lastMessage = response.data[response.data.length - 1];
       setChats(
         chats.map((chat) =>
           chat.id === activeChat.id
             ? {
                 ...chat,
-                messages: [...chat.messages, ...response.data],
+                message_count: (chat.message_count || 0) + response.data.length,
+                last_message_preview: lastMessage.content,
+                last_message_at: lastMessage.created_at,
               }
             : chat
         )
@@ -251,6 +328,9 @@ const ChatPage = () => {
         onNewChat={handleNewChat}
         onDeleteChat={handleDeleteChat}
         onEditChatTitle={handleEditChatTitle}
+        hasMoreChats={hasMoreChats}
+        loadingMoreChats={loadingMoreChats}
+        onLoadMoreChats={handleLoadMoreChats}
         isMobileSidebarOpen={mobileSidebarOpen}
         onMobileSidebarClose={() => setMobileSidebarOpen(false)}
       />
@@ -23,6 +23,8 @@ import {
   DialogContent,
   DialogContentText,
   DialogActions,
+  FormControlLabel,
+  Switch,
   useTheme,
 } from '@mui/material';
 import {
@@ -40,7 +42,7 @@ import {
   Schedule as ScheduleIcon,
   Cancel as CancelIcon,
 } from '@mui/icons-material';
-import { useNavigate } from 'react-router-dom';
+import { useNavigate, useLocation } from 'react-router-dom';
 import { useAuth } from '../hooks/useAuth';
 import api from '../services/api';
 
@@ -64,14 +66,19 @@ function TabPanel(props) {
 const ProfilePage = () => {
   const theme = useTheme();
   const navigate = useNavigate();
+  const location = useLocation();
   const { user, logout } = useAuth();
   
-  const [tabValue, setTabValue] = useState(0);
+  // Emails link to ?tab=settings
+  const [tabValue, setTabValue] = useState(
+    new URLSearchParams(location.search).get('tab') === 'settings' ? 3 : 0
+  );
   const [editing, setEditing] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(null);
   const [openCancelDialog, setOpenCancelDialog] = useState(false);
+  const [dailyDigest, setDailyDigest] = useState(false);
   
   // Form state
   const [profileData, setProfileData] = useState({
@@ -90,6 +97,7 @@ const ProfilePage = () => {
         birthTime: user.birth_time || '',
         birthLocation: user.birth_location || '',
       });
+      setDailyDigest(Boolean(user.daily_digest_opt_in));
     }
   }, [user]);
   
@@ -172,6 +180,25 @@ const ProfilePage = () => {
     }
   };
   
+  const handleDailyDigestChange = async (e) => {
+    const optIn = e.target.checked;
+    
+    try {
+      setDailyDigest(optIn);
+      setError(null);
+      await api.put('/api/v1/auth/me/daily-digest', { daily_digest_opt_in: optIn });
+      setSuccess(optIn ? 'You will get your reading by email every day.' : 'Daily reading emails turned off.');
+    } catch (err) {
+      console.error('Failed to update email preferences:', err);
+      setDailyDigest(!optIn);
+      setError(
+        err.response?.status === 403
+          ? 'Please verify your email address first.'
+          : 'Failed to update email preferences. Please try again.'
+      );
+    }
+  };
+  
   const handleCancelSubscription = () => {
     setOpenCancelDialog(true);
   };
@@ -525,7 +552,18 @@ const ProfilePage = () => {
                   <Divider sx={{ mb: 2 }} />
                 </Grid>
                 
-                {/* Email notification settings would go here */}
+                <Grid item xs={12}>
+                  <FormControlLabel
+                    control={
+                      <Switch
+                        checked={dailyDigest}
+                        onChange={handleDailyDigestChange}
+                        color="primary"
+                      />
+                    }
+                    label="Email me my daily reading"
+                  />
+                </Grid>
                 
                 <Grid item xs={12} sx={{ mt: 4 }}>
                   <Box sx={{ display: 'flex', justifyContent: 'space-between' }}>